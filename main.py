@@ -12,18 +12,109 @@
 #
 # print(response.text)
 import asyncio
+import os
+import shutil
+import tempfile
 import time
 
-import src.treeList as treeList
-import src.fileUtil as fileUtil
+import src.chunkUtil as chunkUtil
+import src.validationUtil as validationUtil
 import json
 
 import src.project_helper_mcpclient as project_helper_mcpclient
 
-
-
-
-if __name__ == '__main__':
+# Number of times failing tests are regenerated with the pytest output as feedback
+MAX_REGENERATION_ATTEMPTS = 2
+# Seconds between the end of a Gemini run and the start of the next one
+GEMINI_CALL_SPACING = 60
+
+_gemini_lock = asyncio.Lock()
+_last_gemini_call = [0.0]
+# MCP server session shared by every run of main(), so the server's read cache is reused
+_session = [None]
+
+
+async def run_throttled(prompt):
+    # Every Gemini run goes through here, including the background regenerations,
+    # so they are serialized and spaced like the main loop
+    async with _gemini_lock:
+        wait = _last_gemini_call[0] + GEMINI_CALL_SPACING - time.monotonic()
+        if _last_gemini_call[0] and wait > 0:
+            await asyncio.sleep(wait)
+        try:
+            return await project_helper_mcpclient.run(prompt, session=_session[0])
+        finally:
+            _last_gemini_call[0] = time.monotonic()
+
+
+def write_atomic(path, text):
+    # Written next to the target then renamed over it, so a pytest process importing the
+    # file never sees it half written
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+        if os.path.exists(path):
+            shutil.copymode(path, temp_path)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+
+async def generate_tests(path, context_file_path, test_path, feedback=""):
+    prompt = f"""please create unit tests for this file {path}, with the context file {context_file_path}"""
+    if feedback:
+        prompt += f""", and pass this feedback about the previous attempt: {feedback}"""
+    functionResponse, results_txt = await run_throttled(prompt)
+    print(functionResponse)
+    write_atomic(test_path, functionResponse.content[0].text)
+
+
+async def validate_and_repair(pool, path, context_file_path, test_path):
+    # Runs in the background while the next files are generated
+    result = await pool.validate(test_path)
+    for attempt in range(MAX_REGENERATION_ATTEMPTS):
+        if result["status"] == "passed":
+            break
+        print(f"🔁 {test_path} {result['status']}, regenerating (attempt {attempt + 1})")
+        await generate_tests(path, context_file_path, test_path, validationUtil.format_feedback(result))
+        result = await pool.validate(test_path)
+    return result
+
+
+async def comment_file(path, context_file_path):
+    prompt = f"""please add comments for this file {path}, with the context file {context_file_path}"""
+    functionResponse, results_txt = await run_throttled(prompt)
+    print(functionResponse)
+    commented = functionResponse.content[0].text
+    with open(path, encoding="utf-8") as f:
+        original = f.read()
+    # An error message or a changed code is never written over the source
+    if not chunkUtil.same_code(original, commented):
+        print(f"⚠️ Comments of {path} change the code or failed, the file is left unchanged")
+        return
+    write_atomic(path, commented)
+
+
+async def validate_then_comment(pool, path, context_file_path, test_path):
+    # The source is only rewritten once its tests are final, so they are validated
+    # (and regenerated) against the original code
+    result = await validate_and_repair(pool, path, context_file_path, test_path)
+    await comment_file(path, context_file_path)
+    return result
+
+
+async def main():
+    async with project_helper_mcpclient.open_session() as session:
+        _session[0] = session
+        try:
+            await process_repo()
+        finally:
+            _session[0] = None
+
+
+async def process_repo():
 
     # tree_string, path_dictionary= treeList.generate_tree_with_functions(r"/home/wenzhen/PycharmProjects/youtube2podcast")
     #
@@ -32,29 +123,25 @@ if __name__ == '__main__':
     # search_prompt = "Can you scan this folder (/home/wenzhen/PycharmProjects/youtube2podcast), and give me the arborescence"
     search_prompt = "Can you checkout this git repo (https://github.com/duwenzhen/project_helper.git) to the local machine, then scan the folder on the local machine, then combine all the files of the path_dictionary into to one big combined file"
 
-    functionResponse, results_txt = asyncio.run(project_helper_mcpclient.run(search_prompt))
+    functionResponse, results_txt = await run_throttled(search_prompt)
 
     res_dict = json.loads(functionResponse.content[0].text)
     context_file_path = res_dict["output_file_path"]
     path_dictionary = res_dict["path_dictionary"]
 
+    pool = validationUtil.ValidationPool()
+    validations = []
 
     for id, path in path_dictionary.items():
         if path.endswith(".py") and not path.endswith("__init__.py"):
-            prompt = f"""please create unit tests for this file {path}, with the context file {context_file_path}"""
-            functionResponse, results_txt = asyncio.run(project_helper_mcpclient.run(prompt))
-            print(functionResponse)
-            open(path.replace(".py", "_test.py"), "w").write(functionResponse.content[0].text)
-            time.sleep(60)
-
-            prompt = f"""please add comments for this file {path}, with the context file {context_file_path}"""
-            functionResponse, results_txt = asyncio.run(project_helper_mcpclient.run(prompt))
-            print(functionResponse)
-            open(path, "w").write(functionResponse.content[0].text)
-            time.sleep(60)
-
-
-
+            test_path = path.replace(".py", "_test.py")
+            await generate_tests(path, context_file_path, test_path)
+            validations.append(asyncio.create_task(validate_then_comment(pool, path, context_file_path, test_path)))
 
+    for result in await asyncio.gather(*validations):
+        print(f"🧪 {result['test_path']}: {result['status']} "
+              f"({result['passed']} passed, {result['failed']} failed, {result['errors']} errors)")
 
 
+if __name__ == '__main__':
+    asyncio.run(main())
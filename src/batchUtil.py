@@ -0,0 +1,62 @@
+"""
+Batching of several target files into one multi-target Gemini request.
+
+Used by the multi-target variants of geminiUtil: files are grouped up to a token budget,
+and the JSON answer of a group is split back per file.
+"""
+import json
+from typing import Dict, List
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count of a text, about 4 characters per token."""
+    return len(text) // 4 + 1
+
+
+def group_targets(contents: Dict[str, str], token_budget: int) -> List[List[str]]:
+    """
+    Groups files, in order, into batches whose estimated size stays under token_budget.
+    A file larger than the budget gets a batch of its own.
+    """
+    groups = []
+    current, current_tokens = [], 0
+    for path, content in contents.items():
+        tokens = estimate_tokens(content)
+        if current and current_tokens + tokens > token_budget:
+            groups.append(current)
+            current, current_tokens = [], 0
+        current.append(path)
+        current_tokens += tokens
+    if current:
+        groups.append(current)
+    return groups
+
+
+def strip_code_fence(code: str) -> str:
+    """Removes the Markdown ```python fence a model may wrap code in."""
+    code = code.strip()
+    if code.startswith("```python"):
+        code = code[9:]
+    if code.endswith("```"):
+        code = code[:-3]
+    return code.strip()
+
+
+def split_multi_response(response_text: str, paths: List[str]) -> Dict[str, str]:
+    """
+    Parses the JSON answer of a multi-target request into {path: code}.
+
+    Entries for paths that were not asked for, and paths answered more than once, are dropped.
+    """
+    try:
+        items = json.loads(response_text)
+    except json.JSONDecodeError:
+        return {}
+    if not isinstance(items, list):
+        return {}
+
+    answers: Dict[str, List[str]] = {}
+    for item in items:
+        if isinstance(item, dict) and item.get("path") in paths and isinstance(item.get("code"), str):
+            answers.setdefault(item["path"], []).append(strip_code_fence(item["code"]))
+    return {path: codes[0] for path, codes in answers.items() if len(codes) == 1}
@@ -0,0 +1,55 @@
+import json
+
+import batchUtil
+
+
+def test_group_targets_under_budget():
+    # 40 characters are 11 estimated tokens
+    contents = {f"f{i}.py": "x" * 40 for i in range(5)}
+    assert batchUtil.group_targets(contents, 25) == [["f0.py", "f1.py"], ["f2.py", "f3.py"], ["f4.py"]]
+    assert batchUtil.group_targets(contents, 1000) == [list(contents)]
+
+
+def test_group_targets_oversized_file_alone():
+    contents = {"small1.py": "x" * 40, "huge.py": "x" * 4000, "small2.py": "x" * 40}
+    assert batchUtil.group_targets(contents, 25) == [["small1.py"], ["huge.py"], ["small2.py"]]
+
+
+def test_group_targets_single_oversized_file():
+    assert batchUtil.group_targets({"huge.py": "x" * 4000}, 10) == [["huge.py"]]
+
+
+def test_group_targets_empty():
+    assert batchUtil.group_targets({}, 100) == []
+
+
+def test_split_multi_response():
+    answer = json.dumps([{"path": "a.py", "code": "a = 1"}, {"path": "b.py", "code": "b = 2"}])
+    assert batchUtil.split_multi_response(answer, ["a.py", "b.py"]) == {"a.py": "a = 1", "b.py": "b = 2"}
+
+
+def test_split_multi_response_not_json():
+    assert batchUtil.split_multi_response("```json\n[{\"path\": ", ["a.py"]) == {}
+    assert batchUtil.split_multi_response('{"path": "a.py", "code": "a = 1"}', ["a.py"]) == {}
+
+
+def test_split_multi_response_drops_duplicate_and_unknown_paths():
+    answer = json.dumps([
+        {"path": "a.py", "code": "a = 1"},
+        {"path": "a.py", "code": "a = 2"},
+        {"path": "other.py", "code": "x = 1"},
+        {"path": "b.py", "code": "b = 2"},
+        {"path": "c.py"},
+        "not an object",
+    ])
+    assert batchUtil.split_multi_response(answer, ["a.py", "b.py", "c.py"]) == {"b.py": "b = 2"}
+
+
+def test_split_multi_response_strips_code_fences():
+    answer = json.dumps([{"path": "a.py", "code": "```python\na = 1\n```"}])
+    assert batchUtil.split_multi_response(answer, ["a.py"]) == {"a.py": "a = 1"}
+
+
+def test_strip_code_fence():
+    assert batchUtil.strip_code_fence("  ```python\nx = 1\n```  ") == "x = 1"
+    assert batchUtil.strip_code_fence("x = 1\n") == "x = 1"
@@ -0,0 +1,200 @@
+"""
+Splits Python source files at top-level function/class boundaries.
+
+Used by the chunked mode of add_comments: each chunk is commented separately,
+the results are stitched back in order, and the reassembled file is checked
+against the original AST (docstrings aside) so the model cannot change the code.
+"""
+import ast
+import hashlib
+import os
+import tempfile
+import textwrap
+from dataclasses import dataclass
+from typing import List, Optional
+
+DEFINITION_NODES = (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)
+FILE_HEADER_MARKER = f"\n{'=' * 40}\n--- FILE: ["
+CACHE_DIR = os.environ.get("PROJECT_HELPER_CACHE_DIR",
+                           os.path.join(tempfile.gettempdir(), "project_helper_cache"))
+
+
+@dataclass
+class SourceChunk:
+    """
+    A contiguous slice of a module's source.
+
+    Attributes:
+        index: Position of the chunk in the file.
+        source: The exact source text; concatenating all chunks gives the original file.
+        name: Name of the function/class the chunk holds, or None for the module header.
+        signature: First line of the definition, used to outline the module for other chunks.
+    """
+    index: int
+    source: str
+    name: Optional[str] = None
+    signature: Optional[str] = None
+
+
+def split_source(source: str) -> List[SourceChunk]:
+    """
+    Splits a module into a header chunk followed by one chunk per top-level function/class.
+
+    A definition chunk starts at its first decorator (or at the comment lines directly above it)
+    and runs until the next definition, so top-level statements in between stay with the
+    preceding chunk.
+
+    Args:
+        source: The Python source code of the module.
+
+    Returns:
+        The list of chunks, in file order. Raises SyntaxError if the source does not parse.
+    """
+    tree = ast.parse(source)
+    lines = source.splitlines(keepends=True)
+
+    starts = []
+    previous_end = 0
+    for node in tree.body:
+        if isinstance(node, DEFINITION_NODES):
+            start = min([node.lineno] + [d.lineno for d in node.decorator_list]) - 1
+            # Keep the comment block sitting right above the definition with it
+            while start > previous_end and lines[start - 1].lstrip().startswith("#"):
+                start -= 1
+            starts.append((start, node))
+        previous_end = node.end_lineno
+
+    chunks = []
+    header_end = starts[0][0] if starts else len(lines)
+    header = "".join(lines[:header_end])
+    if header:
+        chunks.append(SourceChunk(index=0, source=header))
+
+    for i, (start, node) in enumerate(starts):
+        end = starts[i + 1][0] if i + 1 < len(starts) else len(lines)
+        signature = lines[node.lineno - 1].strip()
+        chunks.append(SourceChunk(index=len(chunks), source="".join(lines[start:end]),
+                                  name=node.name, signature=signature))
+    return chunks
+
+
+def strip_docstrings(tree: ast.AST, module_docstring: bool = True) -> ast.AST:
+    """
+    Removes the docstrings of the classes and functions of a parsed tree, in place.
+
+    Args:
+        tree: The parsed tree.
+        module_docstring: Whether the module docstring is removed as well.
+    """
+    owners = ((ast.Module,) if module_docstring else ()) + DEFINITION_NODES
+    for node in ast.walk(tree):
+        if isinstance(node, owners) and node.body:
+            first = node.body[0]
+            if (isinstance(first, ast.Expr) and isinstance(first.value, ast.Constant)
+                    and isinstance(first.value.value, str)):
+                # Keep the body non-empty so the tree stays valid
+                node.body = node.body[1:] or [ast.Pass()]
+    return tree
+
+
+def same_code(original: str, commented: str, module_docstring: bool = True) -> bool:
+    """
+    Checks that two sources have the same AST once docstrings are removed.
+
+    Comments are not part of the AST, so this holds when only comments and docstrings differ.
+    Pass module_docstring=False for chunks that do not start the file, where a leading
+    string would end up as a stray expression in the middle of the module.
+    """
+    try:
+        original_tree = strip_docstrings(ast.parse(original), module_docstring)
+        commented_tree = strip_docstrings(ast.parse(commented), module_docstring)
+    except SyntaxError:
+        return False
+    return ast.dump(original_tree) == ast.dump(commented_tree)
+
+
+def extract_tree_section(context: str) -> str:
+    """
+    Returns the arborescence part of a combined context file (everything before the first file).
+
+    Context that was not produced by combine_files is returned unchanged.
+    """
+    marker_position = context.find(FILE_HEADER_MARKER)
+    if marker_position == -1:
+        return context
+    return context[:marker_position]
+
+
+def build_chunk_context(chunks: List[SourceChunk], index: int, project_tree: str) -> str:
+    """
+    Builds the context sent along with one chunk: the project arborescence, the module header
+    (imports and globals) and the signatures of the other top-level definitions.
+    """
+    parts = [project_tree.strip()]
+    header = chunks[0] if chunks and chunks[0].name is None else None
+    if header is not None and index != header.index:
+        parts.append(f"Module header (imports and globals):\n{header.source.strip()}")
+
+    outline = [c.signature for c in chunks if c.name is not None and c.index != index]
+    if outline:
+        parts.append("Other top-level definitions of this module:\n" + "\n".join(outline))
+    return "\n\n".join(p for p in parts if p)
+
+
+def restore_trailing_whitespace(original: str, commented: str) -> str:
+    """
+    Gives a commented chunk the same trailing blank lines as the original chunk, so the
+    stitched file keeps its spacing between definitions.
+    """
+    trailing = original[len(original.rstrip()):]
+    return commented.strip("\n").rstrip() + (trailing or "\n")
+
+
+def clean_commented_chunk(original: str, commented: str) -> str:
+    """
+    Undoes the usual formatting changes of a model answer before it is compared with the
+    original chunk: a Markdown code fence, an indent added to every line, and different
+    trailing blank lines.
+    """
+    if "```python" in commented:
+        commented = commented.split("```python", 1)[1].split("```")[0]
+    return restore_trailing_whitespace(original, textwrap.dedent(commented.strip("\n")))
+
+
+def cache_key(*parts: str) -> str:
+    """
+    Returns a stable hash of the given strings, used as cache file name.
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def load_cached(namespace: str, key: str) -> Optional[str]:
+    """
+    Returns the cached text for key, or None when it is not in the cache.
+    """
+    path = os.path.join(CACHE_DIR, namespace, key)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def store_cached(namespace: str, key: str, text: str) -> None:
+    """
+    Stores text in the cache under key. Failures to write are ignored, the cache is best effort.
+    """
+    directory = os.path.join(CACHE_DIR, namespace)
+    try:
+        os.makedirs(directory, exist_ok=True)
+        # Write to a temporary file first so concurrent readers never see a partial entry
+        fd, temp_path = tempfile.mkstemp(dir=directory)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(temp_path, os.path.join(directory, key))
+    except OSError:
+        pass
@@ -0,0 +1,146 @@
+import pytest
+
+import chunkUtil
+
+SOURCE = '''"""Module docstring."""
+import os
+
+LIMIT = 3
+
+
+# Comment block of helper
+def helper(x):
+    return x + LIMIT
+
+
+REGISTRY = {}
+
+
+@staticmethod
+@other.decorator
+class Thing:
+    def method(self):
+        return os.sep
+
+
+async def fetch():
+    pass
+'''
+
+
+def test_split_join_round_trip():
+    chunks = chunkUtil.split_source(SOURCE)
+    assert "".join(chunk.source for chunk in chunks) == SOURCE
+    assert [chunk.name for chunk in chunks] == [None, "helper", "Thing", "fetch"]
+    assert [chunk.index for chunk in chunks] == [0, 1, 2, 3]
+
+
+def test_comment_block_and_decorators_stay_with_their_definition():
+    header, helper, thing, fetch = chunkUtil.split_source(SOURCE)
+    assert header.source.endswith("LIMIT = 3\n\n\n")
+    assert helper.source.startswith("# Comment block of helper\ndef helper(x):")
+    # Statements between two definitions stay with the preceding chunk
+    assert "REGISTRY = {}" in helper.source
+    assert thing.source.startswith("@staticmethod\n@other.decorator\nclass Thing:")
+    assert thing.signature == "class Thing:"
+    assert fetch.signature == "async def fetch():"
+
+
+def test_split_without_definitions():
+    chunks = chunkUtil.split_source("x = 1\n")
+    assert len(chunks) == 1 and chunks[0].name is None and chunks[0].source == "x = 1\n"
+
+
+def test_split_starting_with_a_definition():
+    chunks = chunkUtil.split_source("def f():\n    pass\n")
+    assert [chunk.name for chunk in chunks] == ["f"]
+
+
+def test_split_raises_on_invalid_source():
+    with pytest.raises(SyntaxError):
+        chunkUtil.split_source("def broken(:\n")
+
+
+def test_same_code_accepts_comments_and_docstrings():
+    original = "def f(x):\n    return x\n"
+    commented = ('"""Module."""\n'
+                 "def f(x):\n"
+                 '    """Returns x."""\n'
+                 "    # Nothing to compute\n"
+                 "    return x  # as is\n")
+    assert chunkUtil.same_code(original, commented)
+
+
+def test_same_code_accepts_a_docstring_only_body():
+    assert chunkUtil.same_code("def f():\n    pass\n", 'def f():\n    """Does nothing."""\n    pass\n')
+
+
+@pytest.mark.parametrize("commented", [
+    "def f(x):\n    return x + 1\n",
+    "def g(x):\n    return x\n",
+    "def f(x):\n    print(x)\n    return x\n",
+    "def f(x):\n    return x\n\nextra = 1\n",
+    "def f(x:\n    return x\n",
+    "Error: the API failed",
+])
+def test_same_code_rejects_code_changes(commented):
+    assert not chunkUtil.same_code("def f(x):\n    return x\n", commented)
+
+
+def test_same_code_without_module_docstring():
+    # In a chunk that does not start the file, a leading string would be a stray expression
+    original = "def f():\n    pass\n"
+    commented = '"""Stray."""\ndef f():\n    pass\n'
+    assert chunkUtil.same_code(original, commented)
+    assert not chunkUtil.same_code(original, commented, module_docstring=False)
+    # Docstrings of functions and classes are still ignored
+    assert chunkUtil.same_code(original, 'def f():\n    """Doc."""\n    pass\n', module_docstring=False)
+
+
+def test_restore_trailing_whitespace():
+    original = "def f():\n    pass\n\n\n"
+    assert chunkUtil.restore_trailing_whitespace(original, "\ndef f():\n    pass") == original
+    assert chunkUtil.restore_trailing_whitespace("x = 1", "x = 1  # one\n\n") == "x = 1  # one\n"
+
+
+def test_stitched_chunks_keep_their_spacing():
+    chunks = chunkUtil.split_source(SOURCE)
+    # Answers without the trailing blank lines of their chunk
+    stitched = "".join(chunkUtil.restore_trailing_whitespace(chunk.source, chunk.source.strip())
+                       for chunk in chunks)
+    assert stitched == SOURCE
+
+
+def test_clean_commented_chunk():
+    original = "def f(x):\n    return x\n\n\n"
+    answer = '```python\n    def f(x):\n        """Doc."""\n        return x\n```\n'
+    cleaned = chunkUtil.clean_commented_chunk(original, answer)
+    assert cleaned == 'def f(x):\n    """Doc."""\n    return x\n\n\n'
+    assert chunkUtil.same_code(original, cleaned)
+
+
+def test_extract_tree_section():
+    context = f"🌳 project/\n└── [1] a.py{chunkUtil.FILE_HEADER_MARKER}1] a.py ---\nx = 1\n"
+    assert chunkUtil.extract_tree_section(context) == "🌳 project/\n└── [1] a.py"
+    assert chunkUtil.extract_tree_section("plain context") == "plain context"
+
+
+def test_build_chunk_context():
+    chunks = chunkUtil.split_source(SOURCE)
+    context = chunkUtil.build_chunk_context(chunks, 1, "TREE")
+    assert context.startswith("TREE")
+    assert "import os" in context
+    assert "class Thing:" in context and "async def fetch():" in context
+    assert "def helper(x):" not in context
+    # The header chunk does not get itself as context
+    assert "Module header" not in chunkUtil.build_chunk_context(chunks, 0, "TREE")
+
+
+def test_cache_round_trip(tmp_path, monkeypatch):
+    monkeypatch.setattr(chunkUtil, "CACHE_DIR", str(tmp_path))
+    key = chunkUtil.cache_key("v1", "model", "source")
+    assert key == chunkUtil.cache_key("v1", "model", "source")
+    assert key != chunkUtil.cache_key("v1", "models", "ource")
+    assert chunkUtil.load_cached("comments", key) is None
+    chunkUtil.store_cached("comments", key, "commented")
+    assert chunkUtil.load_cached("comments", key) == "commented"
@@ -1,19 +1,27 @@
 import os
-from typing import Dict
+from typing import Awaitable, Callable, Dict, Iterable, Optional, Tuple
 
 import tempfile
 
-async def combine_files(tree_string : str, path_dictionary: Dict[int, str]):
-    """
-    Combines multiple files from a dictionary into a single output file.
+import readUtil
+
+ProgressCallback = Callable[[float, Optional[float], Optional[str]], Awaitable[None]]
 
-    For each file in the map, it writes a header with the key and path,
-    followed by the full content of that file.
+
+async def _write_combined(tree_lines: Iterable[str], files: Iterable[Tuple[int, str]], total_files: int,
+                          on_progress: Optional[ProgressCallback] = None) -> str:
+    """
+    Writes the arborescence followed by the content of each file into a new temporary file.
 
     Args:
-        path_dictionary: A dictionary where keys are unique identifiers (e.g., int)
-                  and values are the absolute paths to the files to combine.
-        output_file_path: The path for the final combined text file.
+        tree_lines: The lines of the arborescence, written one by one.
+        files: (file id, path) pairs, in the order they are written.
+        total_files: Number of files, for the progress notifications.
+        on_progress: Optional async callback called as (files processed, total files, message)
+                     after each file is added.
+
+    Returns:
+        The path to the combined file.
     """
     temp_dir = tempfile.mkdtemp()
     output_file_path = os.path.join(temp_dir, "combined_project_code.txt")
@@ -23,22 +31,23 @@ async def combine_files(tree_string : str, path_dictionary: Dict[int, str]):
     try:
         with open(output_file_path, 'w', encoding='utf-8') as outfile:
             outfile.write("---Arborescence of the project---\n")
-            outfile.write(tree_string + "\n")
-
-            # Sort by key to ensure a consistent order
-            sorted_files = sorted(path_dictionary.items())
+            for line in tree_lines:
+                outfile.write(line + "\n")
 
-            for file_id, file_path in sorted_files:
+            for processed, (file_id, file_path) in enumerate(files, start=1):
                 # --- Create a clear header for each file ---
                 header = f"\n{'=' * 40}\n--- FILE: [{file_id}] | PATH: {file_path} ---\n{'=' * 40}\n\n"
                 outfile.write(header)
 
                 try:
                     # --- Read the content of the source file and write it ---
-                    with open(file_path, 'r', encoding='utf-8') as infile:
-                        content = infile.read()
-                        outfile.write(content)
-                    print(f"  ✅ Added file [{file_id}]: {os.path.basename(file_path)}")
+                    content = readUtil.read_file(file_path)
+                    if content.is_binary:
+                        outfile.write(f"*** SKIPPED: binary file of {content.size} bytes ***\n")
+                        print(f"  ⏭️ Skipped binary file [{file_id}]: {os.path.basename(file_path)}")
+                    else:
+                        outfile.write(content.text)
+                        print(f"  ✅ Added file [{file_id}]: {os.path.basename(file_path)}")
 
                 except FileNotFoundError:
                     error_message = f"*** ERROR: File not found at path: {file_path} ***\n"
@@ -49,13 +58,56 @@ async def combine_files(tree_string : str, path_dictionary: Dict[int, str]):
                     outfile.write(error_message)
                     print(f"  ❌ Error: Could not read file for ID {file_id}. Reason: {e}")
 
+                if on_progress is not None:
+                    await on_progress(processed, total_files, f"Added file [{file_id}]: {os.path.basename(file_path)}")
+
         print(f"\n🎉 Successfully created the combined file: {output_file_path}")
 
     except IOError as e:
         print(f"🔥 Critical Error: Could not write to output file '{output_file_path}'. Reason: {e}")
+    return output_file_path
+
+
+async def combine_files(tree_string : str, path_dictionary: Dict[int, str],
+                        on_progress: Optional[ProgressCallback] = None):
+    """
+    Combines multiple files from a dictionary into a single output file.
+
+    For each file in the map, it writes a header with the key and path,
+    followed by the full content of that file.
+
+    Args:
+        path_dictionary: A dictionary where keys are unique identifiers (e.g., int)
+                  and values are the absolute paths to the files to combine.
+        output_file_path: The path for the final combined text file.
+        on_progress: Optional async callback called as (files processed, total files, message)
+                     after each file is added.
+    """
+    # Sort by key to ensure a consistent order
+    sorted_files = sorted(path_dictionary.items())
+    output_file_path = await _write_combined([tree_string], sorted_files, len(sorted_files), on_progress)
     return {"output_file_path" : output_file_path, "path_dictionary" : path_dictionary}
 
 
+async def combine_scan(scan, on_progress: Optional[ProgressCallback] = None):
+    """
+    Combines the files of a compact scan (scanResult.ScanResult) into a single output file.
+
+    Same output as combine_files, but the arborescence is rendered line by line and the paths
+    rebuilt one at a time, so neither is held in memory as a whole.
+
+    Args:
+        scan: The ScanResult, e.g. loaded with ScanResult.load from a scan file.
+        on_progress: Optional async callback called as (files processed, total files, message)
+                     after each file is added.
+
+    Returns:
+        A dictionary with output_file_path, the path to the combined file, and file_count.
+    """
+    output_file_path = await _write_combined(scan.iter_tree_lines(), scan.iter_files(), scan.file_count, on_progress)
+    return {"output_file_path": output_file_path, "file_count": scan.file_count}
+
+
 if __name__ == '__main__':
     # --- Example Usage ---
 
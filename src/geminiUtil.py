@@ -2,15 +2,75 @@ from google import genai
 from google.genai import types
 import wave
 import os
+import asyncio
+import ast
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
 from dotenv import load_dotenv
+import batchUtil
+import chunkUtil
+import readUtil
+from mylogging import logger
 
 # Load environment variables from .env file
 load_dotenv()
 api_key = os.environ["GEMINI_API_KEY"]
 client = genai.Client(api_key=api_key)
 
+# Prefixes of the error strings returned instead of raising
+ERROR_PREFIXES = ("Error", "An error occurred", "An unexpected error occurred")
 
-async def create_unit_tests(context_file: str, path_file: str) -> str:
+# Same signature as mcp's Context.report_progress, so the server can pass it straight through.
+ProgressCallback = Callable[[float, Optional[float], Optional[str]], Awaitable[None]]
+
+
+async def _generate_streaming(prompt: str, on_progress: Optional[ProgressCallback] = None,
+                             response_schema: Optional[types.Schema] = None) -> str:
+    """
+    Streams a Gemini generation and returns the full text once it is complete.
+
+    Each partial chunk is forwarded to on_progress as (tokens generated so far, None, chunk text),
+    so callers see output as soon as the model starts producing it.
+
+    Args:
+        prompt: The full prompt to send to the model.
+        on_progress: Optional async callback receiving the streaming progress.
+        response_schema: Optional schema; when given the model answers with JSON following it.
+
+    Returns:
+        The concatenated text of all the streamed chunks.
+    """
+    parts = []
+    tokens = 0
+    config = types.GenerateContentConfig(
+        temperature=0,
+    )
+    if response_schema is not None:
+        config.response_mime_type = "application/json"
+        config.response_schema = response_schema
+    stream = await client.aio.models.generate_content_stream(
+        model="gemini-2.5-pro",
+        contents=prompt,
+        config=config,
+    )
+    async for chunk in stream:
+        text = chunk.text or ""
+        if not text:
+            continue
+        parts.append(text)
+        # Prefer the token count reported by the API, fall back to a rough estimate. MCP
+        # progress must only increase, and the estimate can run ahead of the reported count.
+        usage = chunk.usage_metadata
+        if usage is not None and usage.candidates_token_count:
+            tokens = max(tokens, usage.candidates_token_count)
+        else:
+            tokens += max(1, len(text) // 4)
+        if on_progress is not None:
+            await on_progress(tokens, None, text)
+    return "".join(parts)
+
+
+async def create_unit_tests(context_file: str, path_file: str, on_progress: Optional[ProgressCallback] = None,
+                            feedback: str = "") -> str:
     """
     Generates unit tests for a given Python file using the Gemini API.
 
@@ -22,6 +82,8 @@ async def create_unit_tests(context_file: str, path_file: str) -> str:
         context_file: context file, contains all the context for creating unit tests
         path_file: The absolute or relative path to the Python file that needs
                    unit tests.
+        on_progress: Optional async callback receiving the partial output while it is generated.
+        feedback: Optional outcome of running a previous attempt, used to fix the failing tests.
 
     Returns:
         A string containing the generated Python code for the unit tests.
@@ -30,16 +92,14 @@ async def create_unit_tests(context_file: str, path_file: str) -> str:
     """
     # --- 1. Read the source code file ---
     try:
-        with open(path_file, 'r', encoding='utf-8') as f:
-            file_content = f.read()
+        file_content = readUtil.read_text(path_file)
     except FileNotFoundError:
         return f"Error: The file at '{path_file}' was not found."
     except Exception as e:
         return f"Error reading file '{path_file}': {e}"
 
     try:
-        with open(context_file, 'r', encoding='utf-8') as f:
-            context = f.read()
+        context = readUtil.read_text(context_file, readUtil.MAX_CONTEXT_BYTES)
     except FileNotFoundError:
         return f"Error: The file at '{context_file}' was not found."
     except Exception as e:
@@ -72,21 +132,21 @@ async def create_unit_tests(context_file: str, path_file: str) -> str:
     8.  Do not use too much mock, and run the test, make sure it passes before include it in the test set
     9.  Ensure the output is raw code, not wrapped in Markdown backticks (```python ... ```).
     """
+    if feedback:
+        prompt += f"""
+    **Result of running the previous attempt:**
+    {feedback}
+
+    Fix or drop the failing tests, keeping the ones that passed.
+    """
 
     # --- 4. Call the API and handle the response ---
     try:
-        response = client.models.generate_content(
-            model="gemini-2.5-pro",
-            contents=prompt,
-            config=types.GenerateContentConfig(
-                temperature=0,
-            ),
-        )
-
-        # The generated code is typically in response.text
-        if response.text:
+        response_text = await _generate_streaming(prompt, on_progress)
+
+        if response_text:
             # Clean up the response to remove potential markdown formatting
-            generated_code = response.text.strip()
+            generated_code = response_text.strip()
             if generated_code.startswith("```python"):
                 generated_code = generated_code[9:]
             if generated_code.endswith("```"):
@@ -100,7 +160,7 @@ async def create_unit_tests(context_file: str, path_file: str) -> str:
         return f"An error occurred while communicating with the Gemini API: {e}"
 
 
-async def add_comments(context_file: str, path_file: str) -> str:
+async def add_comments(context_file: str, path_file: str, on_progress: Optional[ProgressCallback] = None) -> str:
     """
     Adds comments to a given Python file using the Gemini API.
 
@@ -113,6 +173,7 @@ async def add_comments(context_file: str, path_file: str) -> str:
                       how the comments should be added.
         path_file: The absolute or relative path to the Python file that needs
                    comments.
+        on_progress: Optional async callback receiving the partial output while it is generated.
 
     Returns:
         A string containing the Python code with added comments.
@@ -120,12 +181,10 @@ async def add_comments(context_file: str, path_file: str) -> str:
         error message string is returned instead.
     """
     try:
-        # Read the content from the context and python files
-        with open(context_file, 'r') as f:
-            context = f.read()
-
-        with open(path_file, 'r') as f:
-            code_content = f.read()
+        # Read the content from the context and python files.
+        # The commented code replaces the file, so a truncated file is refused.
+        context = readUtil.read_text(context_file, readUtil.MAX_CONTEXT_BYTES)
+        code_content = readUtil.read_text(path_file, allow_truncated=False)
 
 
 
@@ -149,16 +208,9 @@ async def add_comments(context_file: str, path_file: str) -> str:
         Return only the fully commented Python code, without any additional explanations or markdown formatting.
         """
 
-        # Generate the content using the model
-        response = client.models.generate_content(
-            model="gemini-2.5-pro",
-            contents=prompt,
-            config=types.GenerateContentConfig(
-                temperature=0,
-            ),
-        )
+        # Generate the content using the model, streaming partial output to the caller
+        commented_code = await _generate_streaming(prompt, on_progress)
         # Clean the response to get only the code block
-        commented_code = response.text
         if "```python" in commented_code:
             commented_code = commented_code.split("```python\n")[1].split("```")[0]
 
@@ -167,4 +219,315 @@ async def add_comments(context_file: str, path_file: str) -> str:
     except FileNotFoundError as e:
         return f"Error: The file was not found - {e}"
     except Exception as e:
-        return f"An unexpected error occurred: {e}"
\ No newline at end of file
+        return f"An unexpected error occurred: {e}"
+
+
+# Bump when the chunk prompt changes, so cached results of the old prompt are not reused
+CHUNK_PROMPT_VERSION = "2"
+
+
+async def _comment_chunk(chunks, index: int, project_tree: str, path_file: str) -> Tuple[str, bool]:
+    """
+    Comments a single chunk of a module, falling back to the original chunk when the API call
+    fails or the model output does not have the same code as the original.
+
+    Returns:
+        (code, commented); commented is False when the original chunk was kept.
+    """
+    chunk = chunks[index]
+    is_header = chunk.name is None
+    key = chunkUtil.cache_key(CHUNK_PROMPT_VERSION, "gemini-2.5-pro", chunk.source)
+    cached = chunkUtil.load_cached("comments", key)
+    if cached is not None:
+        return cached, True
+
+    if is_header:
+        task = ("Add a module-level docstring explaining the purpose of the file, "
+                "and inline comments for complex or non-obvious lines of code.")
+    else:
+        task = (f"Add a docstring to `{chunk.name}` (and to its methods if it is a class) following "
+                "Google's style guide, and inline comments for complex or non-obvious lines of code. "
+                "Do not add a module-level docstring.")
+
+    prompt = f"""
+    **Context:**
+    {chunkUtil.build_chunk_context(chunks, index, project_tree)}
+
+    **Python code fragment to comment (part {index + 1} of {len(chunks)} of {path_file}):**
+    ```python
+{chunk.source}
+    ```
+
+    **Task:**
+    {task}
+    Do not change, add or remove any code, only comments and docstrings.
+
+    Return only the fully commented code fragment, without any additional explanations or markdown formatting.
+    """
+
+    label = f"{path_file} [{chunk.name or 'module header'}]"
+    try:
+        commented = await _generate_streaming(prompt)
+    except Exception as e:
+        logger.error(f"❌ Gemini API error on {label}, kept uncommented: {e}")
+        return chunk.source, False
+    commented = chunkUtil.clean_commented_chunk(chunk.source, commented)
+
+    if not chunkUtil.same_code(chunk.source, commented, module_docstring=is_header):
+        logger.warning(f"⚠️ The comments of {label} change the code, kept uncommented")
+        return chunk.source, False
+    chunkUtil.store_cached("comments", key, commented)
+    return commented, True
+
+
+async def add_comments_chunked(context_file: str, path_file: str,
+                               on_progress: Optional[ProgressCallback] = None,
+                               max_concurrency: int = 4) -> str:
+    """
+    Adds comments to a large Python file, one top-level function/class at a time.
+
+    The file is split at top-level boundaries with `ast`, the chunks are sent concurrently
+    with only their relevant context (the project arborescence, the module header and the
+    signatures of the other definitions), and the results are stitched back in order.
+    A chunk whose API call fails or whose output changes the code is kept as it was, and
+    chunks already commented in a previous run are served from the cache. The number of
+    chunks kept uncommented is logged, and their progress messages say so.
+
+    Args:
+        context_file: A file containing context for
+                      how the comments should be added.
+        path_file: The absolute or relative path to the Python file that needs
+                   comments.
+        on_progress: Optional async callback receiving (chunks done, total chunks, chunk name).
+        max_concurrency: Maximum number of chunks sent to the API at the same time.
+
+    Returns:
+        A string containing the Python code with added comments.
+        If an error occurs (e.g., file not found, syntax error, no chunk could be commented),
+        a descriptive error message string is returned instead.
+    """
+    try:
+        context = readUtil.read_text(context_file, readUtil.MAX_CONTEXT_BYTES)
+        # No size cap here: the file is sent chunk by chunk, but it must decode cleanly as it is rewritten
+        code_content = readUtil.read_text(path_file, max_bytes=0, allow_truncated=False)
+
+        chunks = chunkUtil.split_source(code_content)
+        project_tree = chunkUtil.extract_tree_section(context)
+
+        semaphore = asyncio.Semaphore(max_concurrency)
+        done = [0]
+
+        async def run_chunk(index):
+            async with semaphore:
+                code, commented = await _comment_chunk(chunks, index, project_tree, path_file)
+            done[0] += 1
+            if on_progress is not None:
+                name = chunks[index].name or "module header"
+                await on_progress(done[0], len(chunks), name if commented else f"{name} (kept uncommented)")
+            return code, commented
+
+        results = await asyncio.gather(*(run_chunk(i) for i in range(len(chunks))))
+        commented_code = "".join(code for code, _ in results)
+        fallbacks = sum(1 for _, commented in results if not commented)
+        if fallbacks == len(chunks):
+            return f"Error: None of the {len(chunks)} chunks of '{path_file}' could be commented."
+        if fallbacks:
+            logger.warning(f"⚠️ {fallbacks} of {len(chunks)} chunks of '{path_file}' were kept uncommented")
+
+        # Each chunk was checked on its own, check the stitched file as a whole as well
+        if not chunkUtil.same_code(code_content, commented_code):
+            return f"Error: The commented code of '{path_file}' does not match the original code."
+        return commented_code
+
+    except FileNotFoundError as e:
+        return f"Error: The file was not found - {e}"
+    except SyntaxError as e:
+        return f"Error: Could not parse '{path_file}' - {e}"
+    except Exception as e:
+        return f"An unexpected error occurred: {e}"
+
+
+# Gemini 2.5 Pro answers with at most this many tokens; a batch whose answer does not fit
+# comes back truncated and every file of it has to be redone alone
+MAX_OUTPUT_TOKENS = 65536
+# Tokens of target code sent in one multi-target request, roughly 4 characters per token.
+# The answer repeats the code (comments) or is usually longer than it (tests), so the budget
+# is sized on the output limit, not on the much larger input window.
+MULTI_TOKEN_BUDGET = MAX_OUTPUT_TOKENS // 4
+MULTI_COMMENTS_TOKEN_BUDGET = MAX_OUTPUT_TOKENS // 3
+
+MULTI_RESPONSE_SCHEMA = types.Schema(
+    type=types.Type.ARRAY,
+    items=types.Schema(
+        type=types.Type.OBJECT,
+        properties={
+            "path": types.Schema(type=types.Type.STRING),
+            "code": types.Schema(type=types.Type.STRING),
+        },
+        required=["path", "code"],
+    ),
+)
+
+MULTI_TESTS_TASK = """Generate a complete suite of pytest unit tests for each of the Python files below.
+    Cover all functions, methods and classes, with typical use cases, edge cases and error conditions.
+    Use pytest fixtures for shared setup, add a short comment explaining each test, do not use too much mock,
+    and do not include the original source code in the tests."""
+
+MULTI_COMMENTS_TASK = """Add comprehensive and clear comments to each of the Python files below:
+    a module-level docstring, function and class docstrings following Google's style guide,
+    and inline comments for complex or non-obvious lines of code.
+    Do not change, add or remove any code, only comments and docstrings."""
+
+
+def _context_prefix(context: str) -> str:
+    """
+    Builds the start of every multi-target prompt.
+
+    It only depends on the context, and comes first in the prompt, so all the requests of a run
+    share a byte-identical prefix and benefit from Gemini's implicit prompt caching.
+    """
+    return f"""You are an expert Python developer working on the project described below.
+
+    **Project context:**
+    {context}
+
+    """
+
+
+def _valid_tests(source: str, code: str) -> bool:
+    if not code:
+        return False
+    try:
+        ast.parse(code)
+    except SyntaxError:
+        return False
+    return True
+
+
+def _valid_comments(source: str, code: str) -> bool:
+    return chunkUtil.same_code(source, code)
+
+
+async def _run_multi(context_file: str, path_files: List[str], task: str, allow_truncated: bool, validate: Callable[[str, str], bool],
+                     single: Callable[[str, str], Awaitable[str]], token_budget: int,
+                     on_progress: Optional[ProgressCallback]) -> Dict[str, str]:
+    """
+    Shared implementation of the multi-target variants.
+
+    Files are grouped up to token_budget, each group is sent in one request after the shared
+    context prefix, and the JSON answer is split per file. Files missing from the answer or
+    failing validation are retried alone with the single-target function, whose result must pass
+    the same validation; when the API call itself fails, the files of the group get the error
+    message instead.
+    """
+    results: Dict[str, str] = {}
+    try:
+        context = readUtil.read_text(context_file, readUtil.MAX_CONTEXT_BYTES)
+    except FileNotFoundError:
+        return {path: f"Error: The file at '{context_file}' was not found." for path in path_files}
+    except Exception as e:
+        return {path: f"Error reading file '{context_file}': {e}" for path in path_files}
+
+    contents: Dict[str, str] = {}
+    for path in dict.fromkeys(path_files):
+        try:
+            contents[path] = readUtil.read_text(path, allow_truncated=allow_truncated)
+        except FileNotFoundError:
+            results[path] = f"Error: The file at '{path}' was not found."
+        except Exception as e:
+            results[path] = f"Error reading file '{path}': {e}"
+
+    prefix = _context_prefix(context)
+    total = len(dict.fromkeys(path_files))
+    for group in batchUtil.group_targets(contents, token_budget):
+        files = "\n".join(f"""    ### FILE: {path}
+    ```python
+    {contents[path]}
+    ```
+""" for path in group)
+        prompt = prefix + f"""**Task:**
+    {task}
+
+    **Files:**
+{files}
+    Answer with a JSON array containing one object per file, with "path" set to the file path exactly
+    as given above and "code" set to the resulting raw Python code, not wrapped in Markdown backticks.
+    """
+        try:
+            response_text = await _generate_streaming(prompt, response_schema=MULTI_RESPONSE_SCHEMA)
+        except Exception as e:
+            # The provider refused the batch (quota, rate limit, ...): retrying every file
+            # alone would only send more requests it refuses
+            logger.error(f"❌ Gemini API error on a batch of {len(group)} file(s): {e}")
+            for path in group:
+                results[path] = f"An error occurred while communicating with the Gemini API: {e}"
+            if on_progress is not None:
+                await on_progress(len(results), total, f"Failed {len(group)} file(s) in one request")
+            continue
+
+        answers = batchUtil.split_multi_response(response_text, group)
+        for path in group:
+            code = answers.get(path)
+            if code is not None and validate(contents[path], code):
+                results[path] = code
+            else:
+                # Missing or invalid in the batched answer, fall back to a request of its own
+                code = await single(context_file, path)
+                if validate(contents[path], code) or code.startswith(ERROR_PREFIXES):
+                    results[path] = code
+                else:
+                    results[path] = f"Error: The result for '{path}' did not pass validation."
+        if on_progress is not None:
+            await on_progress(len(results), total, f"Processed {len(group)} file(s) in one request")
+
+    return {path: results[path] for path in dict.fromkeys(path_files)}
+
+
+async def create_unit_tests_multi(context_file: str, path_files: List[str],
+                                  token_budget: int = MULTI_TOKEN_BUDGET,
+                                  on_progress: Optional[ProgressCallback] = None) -> Dict[str, str]:
+    """
+    Generates unit tests for many Python files, sharing one context across few API calls.
+
+    Small files are grouped into a single request up to token_budget; every request starts with
+    the same context prefix so the provider can cache it. The answer is split back per file and
+    each test file must parse; files that fail are regenerated with create_unit_tests.
+
+    Args:
+        context_file: context file, contains all the context for creating unit tests
+        path_files: The paths to the Python files that need unit tests.
+        token_budget: Estimated tokens of source code sent per request.
+        on_progress: Optional async callback receiving (files done, total files, message).
+
+    Returns:
+        A dictionary mapping each path to its generated test code, or to a descriptive
+        error message string when it could not be generated.
+    """
+    return await _run_multi(context_file, path_files, MULTI_TESTS_TASK, True,
+                            _valid_tests, create_unit_tests, token_budget, on_progress)
+
+
+async def add_comments_multi(context_file: str, path_files: List[str],
+                             token_budget: int = MULTI_COMMENTS_TOKEN_BUDGET,
+                             on_progress: Optional[ProgressCallback] = None) -> Dict[str, str]:
+    """
+    Adds comments to many Python files, sharing one context across few API calls.
+
+    Small files are grouped into a single request up to token_budget; every request starts with
+    the same context prefix so the provider can cache it. The answer is split back per file and
+    each commented file must have the same code as the original (docstrings aside); files that
+    fail are commented again with add_comments.
+
+    Args:
+        context_file: A file containing context for
+                      how the comments should be added.
+        path_files: The paths to the Python files that need comments.
+        token_budget: Estimated tokens of source code sent per request.
+        on_progress: Optional async callback receiving (files done, total files, message).
+
+    Returns:
+        A dictionary mapping each path to its commented code, or to a descriptive
+        error message string when it could not be commented.
+    """
+    return await _run_multi(context_file, path_files, MULTI_COMMENTS_TASK, False,
+                            _valid_comments, add_comments, token_budget, on_progress)
@@ -0,0 +1,95 @@
+"""
+Command line interface of the job queue.
+
+Examples:
+    python src/jobCli.py enqueue https://github.com/duwenzhen/project_helper.git /path/to/local/repo
+    python src/jobCli.py enqueue --run_id nightly-2026-10-19 /path/to/local/repo
+    python src/jobCli.py drain --workers 4 --delay 60
+    python src/jobCli.py status
+    python src/jobCli.py list --status failed
+    python src/jobCli.py retry
+
+Repos, local folders included, are processed in a temporary copy: the generated test files and
+commented sources are written under PROJECT_HELPER_OUTPUT_DIR (default: project_helper_output),
+see jobWorker.
+"""
+import argparse
+import os
+import time
+
+from jobQueue import JobQueue, DEFAULT_LEASE_SECONDS, DEFAULT_MAX_ATTEMPTS
+
+DEFAULT_DB_PATH = os.environ.get("PROJECT_HELPER_JOBS_DB", "project_helper_jobs.sqlite3")
+
+
+def main():
+    """
+    Main entry point of the job queue command line.
+    """
+    parser = argparse.ArgumentParser(description="Job queue of the project helper")
+    parser.add_argument("--db", type=str, default=DEFAULT_DB_PATH,
+                        help=f"Path to the SQLite job database (default: {DEFAULT_DB_PATH})")
+    parser.add_argument("--max_attempts", type=int, default=DEFAULT_MAX_ATTEMPTS,
+                        help=f"Attempts before a job is marked as failed (default: {DEFAULT_MAX_ATTEMPTS})")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    enqueue_parser = commands.add_parser("enqueue", help="Queue the full pipeline for repositories")
+    enqueue_parser.add_argument("repos", nargs="+", help="Git urls or local folders")
+    enqueue_parser.add_argument("--run_id", type=str, default=None,
+                                help="Run to add the jobs to (default: a new run named after the current time); "
+                                     "repos already queued in this run are skipped")
+
+    drain_parser = commands.add_parser("drain", help="Run workers until the queue is empty")
+    drain_parser.add_argument("--workers", type=int, default=1, help="Number of worker processes")
+    drain_parser.add_argument("--lease", type=float, default=DEFAULT_LEASE_SECONDS,
+                              help=f"Lease duration in seconds (default: {DEFAULT_LEASE_SECONDS})")
+    drain_parser.add_argument("--delay", type=float, default=0.0,
+                              help="Seconds each worker waits after a Gemini call")
+
+    commands.add_parser("status", help="Count the jobs per task and status")
+
+    list_parser = commands.add_parser("list", help="Show the most recently updated jobs")
+    list_parser.add_argument("--status", type=str, default=None,
+                             choices=["pending", "running", "done", "failed"])
+    list_parser.add_argument("--limit", type=int, default=50)
+
+    commands.add_parser("retry", help="Put the failed jobs back in the queue")
+
+    args = parser.parse_args()
+    queue = JobQueue(args.db, max_attempts=args.max_attempts)
+
+    try:
+        if args.command == "enqueue":
+            run_id = args.run_id or time.strftime("%Y%m%d-%H%M%S")
+            for repo in args.repos:
+                # Local folders are stored absolute, so workers do not depend on their cwd
+                if os.path.isdir(repo):
+                    repo = os.path.abspath(repo)
+                job_id = queue.enqueue(repo, "clone", run_id=run_id)
+                print(f"📥 [{job_id}] run {run_id}: clone {repo}")
+
+        elif args.command == "drain":
+            # Imported here so that the other commands work without a Gemini API key
+            from jobWorker import drain
+            drain(args.db, args.workers, args.lease, args.delay, args.max_attempts)
+
+        elif args.command == "status":
+            for task, counts in sorted(queue.stats().items()):
+                summary = ", ".join(f"{status}: {n}" for status, n in sorted(counts.items()))
+                print(f"{task:<8} {summary}")
+
+        elif args.command == "list":
+            for job in queue.list_jobs(args.status, args.limit):
+                print(f"[{job['id']}] {job['run_id']} {job['status']:<8} {job['task']:<8} {job['repo']} {job['file']} "
+                      f"(attempts: {job['attempts']})")
+                if job["error"]:
+                    print(f"    {job['error'].splitlines()[0]}")
+
+        elif args.command == "retry":
+            print(f"🔁 {queue.retry_failed()} failed job(s) requeued")
+    finally:
+        queue.close()
+
+
+if __name__ == "__main__":
+    main()
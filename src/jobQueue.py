@@ -0,0 +1,237 @@
+"""
+SQLite-backed queue of (repo, file, task) jobs.
+
+Jobs are unique per (run, repo, file, task): enqueuing the same work twice within a run
+is a no-op, while a new run (e.g. the next nightly one) processes the repo again.
+Workers lease a job for a limited time and keep the lease alive with heartbeats;
+a job whose lease expired (the worker crashed or was killed) is handed out again,
+which is how an interrupted run resumes where it stopped.
+"""
+import json
+import sqlite3
+import time
+from typing import Dict, List, Optional, Tuple
+
+TASKS = ("clone", "scan", "combine", "test", "comment")
+DEFAULT_LEASE_SECONDS = 300.0
+DEFAULT_MAX_ATTEMPTS = 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id TEXT NOT NULL DEFAULT '',
+    repo TEXT NOT NULL,
+    file TEXT NOT NULL DEFAULT '',
+    task TEXT NOT NULL,
+    payload TEXT NOT NULL DEFAULT '{}',
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    lease_expires REAL,
+    result TEXT,
+    error TEXT,
+    created REAL NOT NULL,
+    updated REAL NOT NULL,
+    UNIQUE (run_id, repo, file, task)
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, lease_expires);
+"""
+
+# A follow-up job to enqueue in the run of the job that unlocked it: (repo, task, file, payload)
+FollowUp = Tuple[str, str, str, dict]
+
+
+def _row_to_job(row: sqlite3.Row) -> dict:
+    """
+    Converts a jobs row into a dictionary, decoding the JSON columns.
+    """
+    job = dict(row)
+    job["payload"] = json.loads(job["payload"])
+    if job["result"] is not None:
+        job["result"] = json.loads(job["result"])
+    return job
+
+
+class JobQueue:
+    """
+    A job queue stored in a single SQLite file, safe to share between processes.
+
+    Every method runs in its own transaction; lease() takes the write lock up front so two
+    workers can never lease the same job.
+    """
+
+    def __init__(self, db_path: str, max_attempts: int = DEFAULT_MAX_ATTEMPTS):
+        self.db_path = db_path
+        self.max_attempts = max_attempts
+        self._conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        # WAL lets readers (status, list) work while workers write
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def _insert(self, run_id: str, repo: str, task: str, file: str, payload: dict, now: float) -> None:
+        if task not in TASKS:
+            raise ValueError(f"Unknown task '{task}', expected one of {TASKS}")
+        self._conn.execute(
+            "INSERT INTO jobs (run_id, repo, file, task, payload, created, updated) VALUES (?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (run_id, repo, file, task) DO NOTHING",
+            (run_id, repo, file, task, json.dumps(payload), now, now))
+
+    def enqueue(self, repo: str, task: str, file: str = "", payload: Optional[dict] = None,
+                run_id: str = "") -> int:
+        """
+        Adds a job, unless the same (repo, file, task) is already queued in this run.
+
+        Args:
+            run_id: Identifies the run; jobs of a previous run never prevent a new one.
+
+        Returns:
+            The id of the new or already existing job.
+        """
+        self._insert(run_id, repo, task, file, payload or {}, time.time())
+        row = self._conn.execute("SELECT id FROM jobs WHERE run_id = ? AND repo = ? AND file = ? AND task = ?",
+                                 (run_id, repo, file, task)).fetchone()
+        return row["id"]
+
+    def lease(self, worker: str, lease_seconds: float = DEFAULT_LEASE_SECONDS) -> Optional[dict]:
+        """
+        Hands the oldest available job to a worker.
+
+        A job is available when it is pending, or running with an expired lease. Expired jobs
+        that already used all their attempts are marked as failed instead.
+
+        Returns:
+            The leased job as a dictionary, or None when there is nothing to do.
+        """
+        now = time.time()
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._conn.execute(
+                "UPDATE jobs SET status = 'failed', worker = NULL, lease_expires = NULL, updated = ?, "
+                "error = COALESCE(error, 'lease expired') "
+                "WHERE status = 'running' AND lease_expires < ? AND attempts >= ?",
+                (now, now, self.max_attempts))
+            row = self._conn.execute(
+                "SELECT id FROM jobs WHERE status = 'pending' OR (status = 'running' AND lease_expires < ?) "
+                "ORDER BY id LIMIT 1", (now,)).fetchone()
+            if row is None:
+                self._conn.execute("COMMIT")
+                return None
+            self._conn.execute(
+                "UPDATE jobs SET status = 'running', worker = ?, lease_expires = ?, "
+                "attempts = attempts + 1, updated = ? WHERE id = ?",
+                (worker, now + lease_seconds, now, row["id"]))
+            job = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (row["id"],)).fetchone()
+            self._conn.execute("COMMIT")
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        return _row_to_job(job)
+
+    def heartbeat(self, job_id: int, worker: str, lease_seconds: float = DEFAULT_LEASE_SECONDS) -> bool:
+        """
+        Extends the lease of a running job.
+
+        Returns:
+            False when the worker does not hold the lease anymore (it expired and was taken over).
+        """
+        now = time.time()
+        cursor = self._conn.execute(
+            "UPDATE jobs SET lease_expires = ?, updated = ? WHERE id = ? AND worker = ? AND status = 'running'",
+            (now + lease_seconds, now, job_id, worker))
+        return cursor.rowcount == 1
+
+    def complete(self, job_id: int, worker: str, result: dict, follow_ups: Optional[List[FollowUp]] = None) -> bool:
+        """
+        Stores the result of a job and enqueues its follow-up jobs in the same run, in one transaction.
+
+        Only the worker holding the lease can complete a job, so a late or duplicate
+        completion never overwrites a stored result.
+
+        Returns:
+            True when the result was stored.
+        """
+        now = time.time()
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = 'done', result = ?, error = NULL, worker = NULL, "
+                "lease_expires = NULL, updated = ? WHERE id = ? AND worker = ? AND status = 'running'",
+                (json.dumps(result), now, job_id, worker))
+            stored = cursor.rowcount == 1
+            if stored:
+                run_id = self._conn.execute("SELECT run_id FROM jobs WHERE id = ?", (job_id,)).fetchone()["run_id"]
+                for repo, task, file, payload in follow_ups or []:
+                    self._insert(run_id, repo, task, file, payload, now)
+            self._conn.execute("COMMIT")
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        return stored
+
+    def fail(self, job_id: int, worker: str, error: str) -> None:
+        """
+        Records a failed attempt. The job goes back to pending until it used all its attempts.
+        """
+        self._conn.execute(
+            "UPDATE jobs SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+            "error = ?, worker = NULL, lease_expires = NULL, updated = ? "
+            "WHERE id = ? AND worker = ? AND status = 'running'",
+            (self.max_attempts, error, time.time(), job_id, worker))
+
+    def retry_failed(self) -> int:
+        """
+        Puts every failed job back to pending with a fresh attempt count.
+
+        Returns:
+            The number of jobs requeued.
+        """
+        cursor = self._conn.execute(
+            "UPDATE jobs SET status = 'pending', attempts = 0, updated = ? WHERE status = 'failed'",
+            (time.time(),))
+        return cursor.rowcount
+
+    def has_unfinished(self, run_id: Optional[str] = None) -> bool:
+        """
+        Checks whether some jobs, of every run or only of run_id, are still pending or running.
+        """
+        if run_id is None:
+            row = self._conn.execute(
+                "SELECT 1 FROM jobs WHERE status IN ('pending', 'running') LIMIT 1").fetchone()
+        else:
+            row = self._conn.execute(
+                "SELECT 1 FROM jobs WHERE run_id = ? AND status IN ('pending', 'running') LIMIT 1",
+                (run_id,)).fetchone()
+        return row is not None
+
+    def results(self, run_id: str, task: str) -> List[dict]:
+        """
+        Returns the results of the done jobs of one task in a run.
+        """
+        rows = self._conn.execute(
+            "SELECT result FROM jobs WHERE run_id = ? AND task = ? AND status = 'done' ORDER BY id",
+            (run_id, task))
+        return [json.loads(row["result"]) for row in rows]
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """
+        Counts the jobs per task and status, e.g. {"test": {"done": 12, "pending": 3}}.
+        """
+        counts: Dict[str, Dict[str, int]] = {}
+        for row in self._conn.execute("SELECT task, status, COUNT(*) AS n FROM jobs GROUP BY task, status"):
+            counts.setdefault(row["task"], {})[row["status"]] = row["n"]
+        return counts
+
+    def list_jobs(self, status: Optional[str] = None, limit: int = 50) -> List[dict]:
+        """
+        Returns the most recently updated jobs, optionally filtered by status.
+        """
+        if status:
+            rows = self._conn.execute("SELECT * FROM jobs WHERE status = ? ORDER BY updated DESC LIMIT ?",
+                                      (status, limit))
+        else:
+            rows = self._conn.execute("SELECT * FROM jobs ORDER BY updated DESC LIMIT ?", (limit,))
+        return [_row_to_job(row) for row in rows]
@@ -0,0 +1,150 @@
+import time
+
+import pytest
+
+from jobQueue import JobQueue
+
+
+@pytest.fixture
+def queue(tmp_path):
+    # A fresh queue in its own SQLite file, allowing two attempts per job
+    job_queue = JobQueue(str(tmp_path / "jobs.sqlite3"), max_attempts=2)
+    yield job_queue
+    job_queue.close()
+
+
+def test_enqueue_is_idempotent_within_a_run(queue):
+    first = queue.enqueue("repo", "scan", run_id="run1")
+    assert queue.enqueue("repo", "scan", run_id="run1") == first
+    assert len(queue.list_jobs()) == 1
+
+
+def test_enqueue_in_a_new_run_after_done(queue):
+    # A finished job must not prevent the next run from processing the repo again
+    job_id = queue.enqueue("repo", "scan", run_id="run1")
+    job = queue.lease("w1")
+    assert queue.complete(job["id"], "w1", {})
+    assert queue.enqueue("repo", "scan", run_id="run2") != job_id
+    assert queue.stats() == {"scan": {"done": 1, "pending": 1}}
+
+
+def test_enqueue_rejects_unknown_task(queue):
+    with pytest.raises(ValueError):
+        queue.enqueue("repo", "deploy")
+
+
+def test_lease_is_exclusive(queue):
+    queue.enqueue("repo", "scan")
+    job = queue.lease("w1")
+    assert job["worker"] == "w1" and job["attempts"] == 1
+    # The only job is held by w1, there is nothing left for w2
+    assert queue.lease("w2") is None
+
+
+def test_lease_is_exclusive_across_connections(queue):
+    other = JobQueue(queue.db_path)
+    try:
+        queue.enqueue("repo", "scan")
+        assert other.lease("w2") is not None
+        assert queue.lease("w1") is None
+    finally:
+        other.close()
+
+
+def test_expired_lease_is_taken_over(queue):
+    queue.enqueue("repo", "scan")
+    job = queue.lease("w1", lease_seconds=0.01)
+    time.sleep(0.05)
+
+    taken = queue.lease("w2")
+    assert taken["id"] == job["id"] and taken["worker"] == "w2" and taken["attempts"] == 2
+    # The first worker lost its lease: its heartbeat and its late result are refused
+    assert not queue.heartbeat(job["id"], "w1")
+    assert not queue.complete(job["id"], "w1", {"late": True})
+    assert queue.complete(job["id"], "w2", {"ok": True})
+    assert queue.list_jobs()[0]["result"] == {"ok": True}
+
+
+def test_heartbeat_keeps_the_lease(queue):
+    queue.enqueue("repo", "scan")
+    job = queue.lease("w1", lease_seconds=0.05)
+    assert queue.heartbeat(job["id"], "w1", lease_seconds=60)
+    time.sleep(0.1)
+    assert queue.lease("w2") is None
+
+
+def test_complete_only_once(queue):
+    queue.enqueue("repo", "scan")
+    job = queue.lease("w1")
+    assert queue.complete(job["id"], "w1", {"first": True})
+    assert not queue.complete(job["id"], "w1", {"second": True})
+    assert queue.list_jobs()[0]["result"] == {"first": True}
+
+
+def test_complete_enqueues_follow_ups_in_the_same_run(queue):
+    queue.enqueue("repo", "scan", run_id="run1")
+    job = queue.lease("w1")
+    follow_ups = [("repo", "test", "a.py", {}), ("repo", "test", "b.py", {"x": 1})]
+    assert queue.complete(job["id"], "w1", {}, follow_ups)
+
+    pending = queue.list_jobs(status="pending")
+    assert sorted(job["file"] for job in pending) == ["a.py", "b.py"]
+    assert {job["run_id"] for job in pending} == {"run1"}
+
+
+def test_follow_ups_of_a_refused_completion_are_dropped(queue):
+    queue.enqueue("repo", "scan")
+    job = queue.lease("w1", lease_seconds=0.01)
+    time.sleep(0.05)
+    queue.lease("w2")
+    assert not queue.complete(job["id"], "w1", {}, [("repo", "test", "a.py", {})])
+    assert queue.stats() == {"scan": {"running": 1}}
+
+
+def test_fail_retries_until_max_attempts(queue):
+    queue.enqueue("repo", "scan")
+    job = queue.lease("w1")
+    queue.fail(job["id"], "w1", "boom")
+    assert queue.list_jobs()[0]["status"] == "pending"
+
+    job = queue.lease("w1")
+    queue.fail(job["id"], "w1", "boom again")
+    failed = queue.list_jobs()[0]
+    assert failed["status"] == "failed" and failed["error"] == "boom again"
+    assert queue.lease("w1") is None
+    assert not queue.has_unfinished()
+
+
+def test_expired_lease_at_max_attempts_fails(queue):
+    queue.enqueue("repo", "scan")
+    for worker in ("w1", "w2"):
+        assert queue.lease(worker, lease_seconds=0.01) is not None
+        time.sleep(0.05)
+
+    # Both attempts were used by workers that vanished
+    assert queue.lease("w3") is None
+    failed = queue.list_jobs()[0]
+    assert failed["status"] == "failed" and failed["error"] == "lease expired"
+
+
+def test_retry_failed(queue):
+    queue.enqueue("repo", "scan")
+    for _ in range(2):
+        job = queue.lease("w1")
+        queue.fail(job["id"], "w1", "boom")
+
+    assert queue.retry_failed() == 1
+    job = queue.lease("w1")
+    assert job is not None and job["attempts"] == 1
+
+
+def test_unfinished_and_results_per_run(queue):
+    queue.enqueue("repo", "scan", run_id="run1")
+    queue.enqueue("repo", "scan", run_id="run2")
+    job = queue.lease("w1")
+    queue.complete(job["id"], "w1", {"file_count": 3})
+
+    assert not queue.has_unfinished(job["run_id"])
+    assert queue.has_unfinished("run2") and queue.has_unfinished()
+    assert queue.results(job["run_id"], "scan") == [{"file_count": 3}]
+    assert queue.results("run2", "scan") == []
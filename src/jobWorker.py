@@ -0,0 +1,275 @@
+"""
+Worker processes draining the job queue.
+
+Each task of the pipeline (clone, scan, combine, test, comment) is a handler returning
+its result and the follow-up jobs it unlocks; the worker stores both atomically, so a
+run interrupted at any point resumes from the last completed job.
+
+Repos are always processed in a throwaway copy (a clone, or a copy of a local folder), so
+the original is never modified. The generated test files and commented sources are written
+under PROJECT_HELPER_OUTPUT_DIR/<run id>/<job id>-<repo name>/, mirroring the repo layout,
+and the copy is removed once every job of the run is done or failed.
+"""
+import asyncio
+import multiprocessing
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+import traceback
+import uuid
+from typing import List, Tuple
+
+from jobQueue import JobQueue, FollowUp, DEFAULT_LEASE_SECONDS, DEFAULT_MAX_ATTEMPTS
+from gitUtil import clone_repo_native
+from treeList import generate_tree_with_functions
+from fileUtil import combine_files
+from geminiUtil import create_unit_tests, add_comments, ERROR_PREFIXES
+import chunkUtil
+import readUtil
+
+OUTPUT_DIR = os.environ.get("PROJECT_HELPER_OUTPUT_DIR", "project_helper_output")
+
+class JobError(Exception):
+    """Raised by a handler when a job could not be done."""
+
+
+def _check_generated(text: str) -> str:
+    if text.startswith(ERROR_PREFIXES):
+        raise JobError(text)
+    return text
+
+
+def _repo_name(repo: str) -> str:
+    name = os.path.basename(repo.rstrip("/\\"))
+    return (name[:-4] if name.endswith(".git") else name) or "repo"
+
+
+def _copy_folder(path: str) -> str:
+    """
+    Copies a local folder into a new temporary folder, without its hidden entries (.git, .venv, ...).
+    """
+    temp_dir = tempfile.mkdtemp()
+    try:
+        shutil.copytree(path, temp_dir, ignore=shutil.ignore_patterns(".*"), symlinks=True, dirs_exist_ok=True)
+    except BaseException:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        raise
+    return temp_dir
+
+
+def _is_temporary(path: str) -> bool:
+    temp_root = os.path.realpath(tempfile.gettempdir())
+    path = os.path.realpath(path)
+    return path != temp_root and os.path.commonpath([path, temp_root]) == temp_root
+
+
+def _work_file(job: dict) -> str:
+    path = job["file"]
+    if not os.path.isfile(path):
+        raise JobError(f"'{path}' does not exist anymore; the copy of a finished run is removed, "
+                       f"enqueue the repo in a new run")
+    return path
+
+
+def _output_file(payload: dict, path: str) -> str:
+    """
+    Maps a path of the work copy to the same place in the output folder of the repo.
+    """
+    output_file = os.path.join(payload["output_path"], os.path.relpath(path, payload["local_path"]))
+    os.makedirs(os.path.dirname(output_file), exist_ok=True)
+    return output_file
+
+
+def _is_test_file(path: str) -> bool:
+    name = os.path.basename(path)
+    return name.endswith("_test.py") or name.startswith("test_")
+
+
+async def _clone(job: dict) -> Tuple[dict, List[FollowUp]]:
+    repo = job["repo"]
+    # The original is never worked on: a local folder is copied, anything else is cloned
+    if os.path.isdir(repo):
+        local_path = await asyncio.to_thread(_copy_folder, repo)
+    else:
+        local_path = await clone_repo_native(repo)
+        if local_path is None:
+            raise JobError(f"Could not clone {repo}")
+    output_path = os.path.abspath(os.path.join(OUTPUT_DIR, job["run_id"] or "default",
+                                               f"{job['id']}-{_repo_name(repo)}"))
+    payload = {"local_path": local_path, "output_path": output_path}
+    return payload, [(repo, "scan", "", payload)]
+
+
+async def _scan(job: dict) -> Tuple[dict, List[FollowUp]]:
+    local_path = job["payload"]["local_path"]
+    if not os.path.isdir(local_path):
+        raise JobError(f"Error: Provided path '{local_path}' is not a directory.")
+    tree_string, path_dictionary = await generate_tree_with_functions(local_path)
+    # A repo without any .py/.toml/.md file is a valid, empty result
+    if not path_dictionary:
+        return {"file_count": 0}, []
+    payload = {"tree_string": tree_string, "path_dictionary": path_dictionary,
+               "local_path": local_path, "output_path": job["payload"]["output_path"]}
+    return {"file_count": len(path_dictionary)}, [(job["repo"], "combine", "", payload)]
+
+
+async def _combine(job: dict) -> Tuple[dict, List[FollowUp]]:
+    payload = job["payload"]
+    combined = await combine_files(payload["tree_string"], payload["path_dictionary"])
+    context_file = combined["output_file_path"]
+    follow_up_payload = {"context_file": context_file, "local_path": payload["local_path"],
+                         "output_path": payload["output_path"]}
+    # Test files already in the repo (or generated by a previous run) get neither tests nor comments
+    follow_ups = [(job["repo"], task, path, follow_up_payload)
+                  for path in combined["path_dictionary"].values()
+                  if path.endswith(".py") and not path.endswith("__init__.py") and not _is_test_file(path)
+                  for task in ("test", "comment")]
+    return {"output_file_path": context_file}, follow_ups
+
+
+async def _test(job: dict) -> Tuple[dict, List[FollowUp]]:
+    path = _work_file(job)
+    generated = _check_generated(await create_unit_tests(job["payload"]["context_file"], path))
+    test_path = _output_file(job["payload"], path[:-len(".py")] + "_test.py")
+    with open(test_path, "w", encoding="utf-8") as f:
+        f.write(generated)
+    return {"test_path": test_path}, []
+
+
+async def _comment(job: dict) -> Tuple[dict, List[FollowUp]]:
+    path = _work_file(job)
+    original = readUtil.read_text(path, max_bytes=0, allow_truncated=False)
+    commented = _check_generated(await add_comments(job["payload"]["context_file"], path))
+    if not chunkUtil.same_code(original, commented):
+        raise JobError(f"The commented version of '{path}' changes the code, it was not written")
+    output_file = _output_file(job["payload"], path)
+    with open(output_file, "w", encoding="utf-8") as f:
+        f.write(commented)
+    return {"path": output_file}, []
+
+
+HANDLERS = {
+    "clone": _clone,
+    "scan": _scan,
+    "combine": _combine,
+    "test": _test,
+    "comment": _comment,
+}
+
+
+def _heartbeat(db_path: str, job_id: int, worker: str, lease_seconds: float,
+               stop: threading.Event) -> None:
+    """
+    Renews the lease from a thread, so it keeps going while a handler blocks the event loop.
+
+    A database error (e.g. "database is locked" while other workers write) must not end the
+    thread, or the lease would expire under a running job: it is logged and retried.
+    """
+    queue = None
+    try:
+        while not stop.wait(lease_seconds / 3):
+            try:
+                if queue is None:
+                    queue = JobQueue(db_path)
+                renewed = queue.heartbeat(job_id, worker, lease_seconds)
+            except sqlite3.Error as e:
+                print(f"⚠️ [{worker}] Heartbeat of job {job_id} failed, retrying: {e}")
+                continue
+            if not renewed:
+                print(f"⚠️ [{worker}] Lost the lease of job {job_id}")
+                return
+    finally:
+        if queue is not None:
+            queue.close()
+
+
+async def _run_job(queue: JobQueue, job: dict, worker: str, lease_seconds: float) -> None:
+    stop = threading.Event()
+    heartbeat = threading.Thread(target=_heartbeat,
+                                 args=(queue.db_path, job["id"], worker, lease_seconds, stop),
+                                 daemon=True)
+    heartbeat.start()
+    try:
+        result, follow_ups = await HANDLERS[job["task"]](job)
+    except Exception as e:
+        queue.fail(job["id"], worker, f"{e}\n{traceback.format_exc()}")
+        print(f"❌ [{worker}] {job['task']} {job['repo']} {job['file']}: {e}")
+        return
+    finally:
+        stop.set()
+        heartbeat.join()
+    if queue.complete(job["id"], worker, result, follow_ups):
+        print(f"✅ [{worker}] {job['task']} {job['repo']} {job['file']}")
+    else:
+        print(f"⚠️ [{worker}] Result of job {job['id']} dropped, its lease was taken over")
+
+
+def _cleanup_run(queue: JobQueue, run_id: str) -> None:
+    """
+    Removes the work copies and combined context files of a finished run.
+
+    Only temporary folders are removed, whatever the stored results say.
+    """
+    folders = [result["local_path"] for result in queue.results(run_id, "clone")]
+    folders += [os.path.dirname(result["output_file_path"]) for result in queue.results(run_id, "combine")]
+    for folder in folders:
+        if _is_temporary(folder) and os.path.isdir(folder):
+            shutil.rmtree(folder, ignore_errors=True)
+            print(f"🧹 Removed {folder}, run {run_id} is finished")
+
+
+async def run_worker(db_path: str, worker: str, lease_seconds: float = DEFAULT_LEASE_SECONDS,
+                     delay: float = 0.0, max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+                     poll_interval: float = 2.0) -> None:
+    """
+    Leases and runs jobs until the queue has no pending or running job left.
+
+    Args:
+        db_path: Path to the SQLite job database.
+        worker: Unique name of this worker, recorded on the jobs it leases.
+        lease_seconds: Lease duration; the heartbeat renews it every third of it.
+        delay: Seconds to wait after each test/comment job, to stay under the API rate limits.
+        max_attempts: Attempts before a job is marked as failed.
+        poll_interval: Seconds to wait when other workers still hold all the remaining jobs.
+    """
+    queue = JobQueue(db_path, max_attempts)
+    try:
+        while True:
+            job = queue.lease(worker, lease_seconds)
+            if job is None:
+                # Jobs running elsewhere may still enqueue follow-ups, or expire and come back
+                if not queue.has_unfinished():
+                    return
+                await asyncio.sleep(poll_interval)
+                continue
+            await _run_job(queue, job, worker, lease_seconds)
+            if not queue.has_unfinished(job["run_id"]):
+                _cleanup_run(queue, job["run_id"])
+            if delay and job["task"] in ("test", "comment"):
+                await asyncio.sleep(delay)
+    finally:
+        queue.close()
+
+
+def _worker_main(db_path: str, worker: str, lease_seconds: float, delay: float, max_attempts: int) -> None:
+    asyncio.run(run_worker(db_path, worker, lease_seconds, delay, max_attempts))
+
+
+def drain(db_path: str, workers: int = 1, lease_seconds: float = DEFAULT_LEASE_SECONDS,
+          delay: float = 0.0, max_attempts: int = DEFAULT_MAX_ATTEMPTS) -> None:
+    """
+    Starts worker processes and waits until they emptied the queue.
+    """
+    prefix = f"{os.uname().nodename if hasattr(os, 'uname') else 'local'}-{uuid.uuid4().hex[:6]}"
+    processes = [multiprocessing.Process(target=_worker_main,
+                                         args=(db_path, f"{prefix}-{i}", lease_seconds, delay, max_attempts))
+                 for i in range(workers)]
+    started = time.time()
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    print(f"🎉 Queue drained by {workers} worker(s) in {time.time() - started:.0f}s")
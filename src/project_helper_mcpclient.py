@@ -1,5 +1,6 @@
 # pip install google-generativeai mcp
 import asyncio
+import contextlib
 import os
 # Add json import for formatting output
 import json
@@ -8,6 +9,7 @@ from datetime import datetime
 from google import genai
 from google.genai import types
 from mcp import ClientSession, StdioServerParameters
+import mcp.types as mcp_types
 from mcp.client.stdio import stdio_client
 from dotenv import load_dotenv
 import markdown
@@ -32,89 +34,144 @@ server_params = StdioServerParameters(
 )
 
 
-async def run(prompt_content):
+async def print_progress(progress, total, message):
     """
-    Runs a multi-turn conversation with the Gemini model, allowing it to call
-    a sequence of tools to fulfill the user's request.
+    Default progress handler: prints the MCP progress notifications sent by the server.
+
+    Tools that know their total (e.g. files to combine) are shown as a counter, streaming
+    generations print their partial output as it arrives.
+    """
+    if total:
+        print(f"  ⏳ [{int(progress)}/{int(total)}] {message or ''}")
+    elif message:
+        print(message, end="", flush=True)
+
+
+async def call_tool(session, tool_name, tool_args, on_progress=print_progress):
+    """
+    Calls a tool of the MCP server, and tells the server to stop it when the call is cancelled.
+
+    ClientSession does not send notifications/cancelled by itself when the awaiting task is
+    cancelled, the server would keep running the tool (and streaming Gemini) until its end.
+    """
+    # The id the session gives to its next request: call_tool sends it without awaiting anything
+    # before, so no other request of a shared session can take it in between
+    request_id = session._request_id
+    try:
+        return await session.call_tool(tool_name, arguments=tool_args, progress_callback=on_progress)
+    except asyncio.CancelledError:
+        notification = mcp_types.ClientNotification(mcp_types.CancelledNotification(
+            method="notifications/cancelled",
+            params=mcp_types.CancelledNotificationParams(requestId=request_id, reason="Cancelled by the client"),
+        ))
+        # Shielded, so a second cancellation does not lose the notification
+        await asyncio.shield(session.send_notification(notification))
+        raise
+
+
+@contextlib.asynccontextmanager
+async def open_session():
+    """
+    Starts the MCP server and yields an initialized session.
+
+    Passing the session to several run() calls keeps a single server process alive,
+    so its per-process state (e.g. the read cache of readUtil) is shared between them.
     """
     async with stdio_client(server_params) as (read, write):
         async with ClientSession(read, write) as session:
             await session.initialize()
+            yield session
 
-            mcp_tools = await session.list_tools()
-            tools = [
-                types.Tool(
-                    function_declarations=[
-                        {
-                            "name": tool.name,
-                            "description": tool.description,
-                            "parameters": {
-                                k: v
-                                for k, v in tool.inputSchema.items()
-                                if k not in ["additionalProperties", "$schema"]
-                            },
-                        }
-                    ]
-                )
-                for tool in mcp_tools.tools
-            ]
 
-            # 1. Start the conversation with the user's prompt.
-            # The model API expects a list of contents.
-            conversation_history = [types.Content(role="user", parts=[types.Part(text=prompt_content)])]
-            print(f"▶️ Starting conversation with prompt: \"{prompt_content}\"")
-
-            # 2. Loop until the model gives a final text answer instead of a tool call.
-            while True:
-                # Send the entire conversation history to the model
-                response = client.models.generate_content(
-                    # Using a model that is strong with multi-turn tool use
-                    model="gemini-2.5-flash",
-                    contents=conversation_history,
-                    config=types.GenerateContentConfig(
-                        temperature=0,
-                        tools=tools,
-                    ),
-                )
-
-                latest_part = response.candidates[0].content.parts[0]
-
-                # 3. Check if the model's response is a function call.
-                if not latest_part.function_call:
-                    # If not, we're done. The model has provided its final answer.
-                    print("\n✅ Model has finished. Final response:")
-                    print(response.text)
-                    return tool_result, response.text
-
-                # 4. If we are here, the model wants to call a tool.
-                function_call = latest_part.function_call
-                tool_name = function_call.name
-                tool_args = dict(function_call.args)
-
-                print(f"🤖 Model wants to call tool: {tool_name}({json.dumps(tool_args)})")
-
-                # Add the model's tool request to our history
-                conversation_history.append(response.candidates[0].content)
-
-                # 5. Execute the tool call using the MCP session.
-                tool_result = await session.call_tool(tool_name, arguments=tool_args)
-                print(f"🛠️ Tool '{tool_name}' executed.")
-
-                # 6. Add the tool's result back to the conversation history.
-                # This informs the model of the outcome of the tool call.
-                conversation_history.append(
-                    types.Content(
-                        role = "function",
-                        parts=[
-                            types.Part(
-                                function_response=types.FunctionResponse(
-                                    name=tool_name,
-                                    # The response from the tool must be a dictionary.
-                                    response={"result": tool_result},
-                                )
-                            )
-                        ]
+async def run(prompt_content, on_progress=print_progress, session=None):
+    """
+    Runs a multi-turn conversation with the Gemini model, allowing it to call
+    a sequence of tools to fulfill the user's request.
+
+    Progress notifications of long tools are forwarded to on_progress as
+    (progress, total, message). Cancelling the task running this coroutine
+    stops the conversation, and the pending tool call with it.
+
+    Without a session (see open_session), a new MCP server is started for this run only.
+    """
+    if session is None:
+        async with open_session() as session:
+            return await run(prompt_content, on_progress, session)
+
+    mcp_tools = await session.list_tools()
+    tools = [
+        types.Tool(
+            function_declarations=[
+                {
+                    "name": tool.name,
+                    "description": tool.description,
+                    "parameters": {
+                        k: v
+                        for k, v in tool.inputSchema.items()
+                        if k not in ["additionalProperties", "$schema"]
+                    },
+                }
+            ]
+        )
+        for tool in mcp_tools.tools
+    ]
+
+    # 1. Start the conversation with the user's prompt.
+    # The model API expects a list of contents.
+    conversation_history = [types.Content(role="user", parts=[types.Part(text=prompt_content)])]
+    print(f"▶️ Starting conversation with prompt: \"{prompt_content}\"")
+
+    # 2. Loop until the model gives a final text answer instead of a tool call.
+    while True:
+        # Send the entire conversation history to the model
+        response = client.models.generate_content(
+            # Using a model that is strong with multi-turn tool use
+            model="gemini-2.5-flash",
+            contents=conversation_history,
+            config=types.GenerateContentConfig(
+                temperature=0,
+                tools=tools,
+            ),
+        )
+
+        latest_part = response.candidates[0].content.parts[0]
+
+        # 3. Check if the model's response is a function call.
+        if not latest_part.function_call:
+            # If not, we're done. The model has provided its final answer.
+            print("\n✅ Model has finished. Final response:")
+            print(response.text)
+            return tool_result, response.text
+
+        # 4. If we are here, the model wants to call a tool.
+        function_call = latest_part.function_call
+        tool_name = function_call.name
+        tool_args = dict(function_call.args)
+
+        print(f"🤖 Model wants to call tool: {tool_name}({json.dumps(tool_args)})")
+
+        # Add the model's tool request to our history
+        conversation_history.append(response.candidates[0].content)
+
+        # 5. Execute the tool call using the MCP session.
+        tool_result = await call_tool(session, tool_name, tool_args, on_progress)
+        print(f"🛠️ Tool '{tool_name}' executed.")
+
+        # 6. Add the tool's result back to the conversation history.
+        # This informs the model of the outcome of the tool call.
+        conversation_history.append(
+            types.Content(
+                role = "function",
+                parts=[
+                    types.Part(
+                        function_response=types.FunctionResponse(
+                            name=tool_name,
+                            # The response from the tool must be a dictionary.
+                            response={"result": tool_result},
+                        )
                     )
-                )
-                # The loop will now continue, sending the updated history back to the model
-                # for it to decide the next step.
+                ]
+            )
+        )
+        # The loop will now continue, sending the updated history back to the model
+        # for it to decide the next step.
@@ -5,15 +5,24 @@ This module sets up an MCP-compliant server and registers gemini api tools
 that follow Anthropic's Model Context Protocol specification. These tools can be
 accessed by Claude and other MCP-compatible AI models.
 """
-from mcp.server.fastmcp import FastMCP
-from typing import Dict
+from mcp.server.fastmcp import FastMCP, Context
+from typing import Dict, List
 import argparse
+import os
+import tempfile
 from mylogging import logger
 from treeList import generate_tree_with_functions
 from fileUtil import combine_files
+from fileUtil import combine_scan
+from scanResult import ScanResult, load_scan, scan_tree
 from gitUtil import clone_repo_native
 from geminiUtil import create_unit_tests
 from geminiUtil import add_comments
+from geminiUtil import add_comments_chunked
+from geminiUtil import create_unit_tests_multi
+from geminiUtil import add_comments_multi
+from geminiUtil import MULTI_TOKEN_BUDGET
+from geminiUtil import MULTI_COMMENTS_TOKEN_BUDGET
 DEFAULT_PORT = 3001
 DEFAULT_CONNECTION_TYPE = "stdio"  # Alternative: "stdio"
 def create_mcp_server(port=DEFAULT_PORT):
@@ -60,6 +69,66 @@ def register_tools(mcp):
             "path_dictionary": path_dictionary
         }
 
+    @mcp.tool()
+    async def scan_folder_compact(path : str, page_size : int = 500):
+        """
+        Scan the folder like browse_folder, but for very large trees: the scan is saved into a compact
+        scan file instead of being returned, only the first page of the arborescence is returned.
+        Args:
+            path: the path to the folder you want to scan
+            page_size: number of lines of the arborescence per page
+
+        Returns:
+            return in a dictionary, scan_file_path, the path to the scan file, file_count, line_count,
+            page_count and first_page, the first page of the arborescence as a string.
+            If page_size is not valid, an error message string is returned instead.
+        """
+        if page_size < 1:
+            return f"Error: page_size must be at least 1, got {page_size}."
+        scan = await scan_tree(path)
+        scan_file_path = os.path.join(tempfile.mkdtemp(), "scan.jsonl.gz")
+        scan.save(scan_file_path)
+        return {
+            "scan_file_path": scan_file_path,
+            "file_count": scan.file_count,
+            "line_count": scan.line_count,
+            "page_count": -(-scan.line_count // page_size),
+            "first_page": scan.render_page(0, page_size),
+        }
+
+    @mcp.tool()
+    async def read_scan_page(scan_file_path : str, page : int, page_size : int = 500) -> str:
+        """
+        Read one page of the arborescence of a scan file created by scan_folder_compact
+        Args:
+            scan_file_path: the path to the scan file
+            page: the page number, starting at 0
+            page_size: number of lines of the arborescence per page
+
+        Returns:
+            return the lines of the arborescence of this page as a string,
+            or an error message string if page or page_size is not valid
+        """
+        if page_size < 1:
+            return f"Error: page_size must be at least 1, got {page_size}."
+        if page < 0:
+            return f"Error: page must be at least 0, got {page}."
+        return load_scan(scan_file_path).render_page(page, page_size)
+
+    @mcp.tool()
+    async def combine_scan_file(scan_file_path : str, ctx: Context):
+        """
+        for each file of a scan file created by scan_folder_compact, take the contains and combine all the content into one big file
+        Args:
+            scan_file_path: the path to the scan file
+
+        Progress (files processed out of the total) is reported through MCP progress notifications.
+
+        Returns:
+            return dictionary of output_file_path, a path to the big file with combined content, and file_count
+        """
+        return await combine_scan(load_scan(scan_file_path), ctx.report_progress)
+
     @mcp.tool()
     async def checkout_git_repo(url : str) -> str:
         """
@@ -73,7 +142,7 @@ def register_tools(mcp):
         return await clone_repo_native(url)
 
     @mcp.tool()
-    async def combine_path_dictionary(tree_string  :str, path_dictionary) :
+    async def combine_path_dictionary(tree_string  :str, path_dictionary, ctx: Context) :
         """
         for each file in the path_dictionary, take the contains and combine all the content into one big file
         Args:
@@ -81,53 +150,104 @@ def register_tools(mcp):
             path_dictionary: a dictionary of key = int and value = str, int is the unique number and str is the path to the file
             tree_string : the arborescence of the folders as a string
 
+        Progress (files processed out of the total) is reported through MCP progress notifications.
+
         Returns:
             return dictionary of output_file_path, a path to the big file with combined content, and path_dictionary
         """
-        return await combine_files(tree_string, path_dictionary)
+        return await combine_files(tree_string, path_dictionary, ctx.report_progress)
 
     @mcp.tool()
-    async def tool_create_unit_tests(context: str, path_file: str) -> str:
+    async def tool_create_unit_tests(context: str, path_file: str, ctx: Context, feedback: str = "") -> str:
         """
         Generates unit tests for a given Python file using the Gemini API.
 
         This function reads the content of a Python file, combines it with user-provided
         context file's content, and sends it to the Gemini model to generate a suite of unit tests
-        using the pytest framework.
+        using the pytest framework. The partial output and the number of generated tokens are
+        streamed back through MCP progress notifications.
 
         Args:
             context: its file. contains all the context gemini will need to create unit tests
             path_file: The absolute or relative path to the Python file that needs
                        unit tests.
+            feedback: optional, the pytest result of the previous attempt, when regenerating failing tests.
 
         Returns:
             A string containing the generated Python code for the unit tests.
             If an error occurs (e.g., file not found, API error), a descriptive
             error message string is returned instead.
         """
-        return await create_unit_tests(context, path_file)
+        return await create_unit_tests(context, path_file, ctx.report_progress, feedback)
 
     @mcp.tool()
-    async def tool_add_comments(context: str, path_file: str) -> str:
+    async def tool_add_comments(context: str, path_file: str, ctx: Context, chunked: bool = False) -> str:
         """
         Adds comments to a given Python file using the Gemini API.
 
         This function reads the content of a Python file, combines it with user-provided
         context, and sends it to the Gemini model to add comprehensive comments,
-        including docstrings and inline comments.
+        including docstrings and inline comments. The partial output and the number of
+        generated tokens are streamed back through MCP progress notifications.
 
         Args:
             context_file: A file containing context for
                           how the comments should be added.
             path_file: The absolute or relative path to the Python file that needs
                        comments.
+            chunked: set it to true for large files (thousands of lines), the file is then
+                     commented one top-level function/class at a time.
 
         Returns:
             A string containing the Python code with added comments.
             If an error occurs (e.g., file not found, API error), a descriptive
             error message string is returned instead.
         """
-        return await add_comments(context, path_file)
+        if chunked:
+            return await add_comments_chunked(context, path_file, ctx.report_progress)
+        return await add_comments(context, path_file, ctx.report_progress)
+
+    @mcp.tool()
+    async def tool_create_unit_tests_multi(context: str, path_files: List[str], ctx: Context,
+                                           token_budget: int = MULTI_TOKEN_BUDGET) -> Dict[str, str]:
+        """
+        Generates unit tests for many Python files at once using the Gemini API.
+
+        Prefer it over tool_create_unit_tests when there are several files: the context is sent
+        once per request for a whole group of small files instead of once per file.
+
+        Args:
+            context: its file. contains all the context gemini will need to create unit tests
+            path_files: the list of the paths to the Python files that need unit tests.
+            token_budget: optional, the estimated number of tokens of source code sent per request.
+
+        Returns:
+            A dictionary mapping each path to the generated Python code of its unit tests,
+            or to a descriptive error message string.
+        """
+        return await create_unit_tests_multi(context, path_files, token_budget, ctx.report_progress)
+
+    @mcp.tool()
+    async def tool_add_comments_multi(context: str, path_files: List[str], ctx: Context,
+                                      token_budget: int = MULTI_COMMENTS_TOKEN_BUDGET) -> Dict[str, str]:
+        """
+        Adds comments to many Python files at once using the Gemini API.
+
+        Prefer it over tool_add_comments when there are several files: the context is sent
+        once per request for a whole group of small files instead of once per file.
+
+        Args:
+            context: A file containing context for
+                     how the comments should be added.
+            path_files: the list of the paths to the Python files that need comments.
+            token_budget: optional, the estimated number of tokens of source code sent per request;
+                          the answer repeats the code, keep it around a third of the model's output limit.
+
+        Returns:
+            A dictionary mapping each path to its Python code with added comments,
+            or to a descriptive error message string.
+        """
+        return await add_comments_multi(context, path_files, token_budget, ctx.report_progress)
 
     @mcp.tool()
     def server_status():
@@ -0,0 +1,273 @@
+"""
+Shared file reading for the scanners, combine_files and the Gemini prompts.
+
+read_file reads a file once per run: the bytes are sniffed for binary content, the
+encoding is detected (BOM, PEP 263 coding cookie, UTF-8, then Latin-1; the candidate must
+decode the whole head strictly), files above the
+size cap keep only their head and tail, and the result is kept in a cache bounded by a
+byte budget and invalidated when the file changes on disk. Large files are read through
+mmap, so truncating them never loads the middle part.
+
+The cache lives in the process: the MCP server and the job workers only benefit from it
+when they are reused across calls (see project_helper_mcpclient.open_session).
+
+The limits come from the PROJECT_HELPER_MAX_FILE_BYTES, PROJECT_HELPER_MAX_CONTEXT_BYTES
+and PROJECT_HELPER_READ_CACHE_BYTES environment variables, or from configure().
+"""
+import codecs
+import io
+import mmap
+import os
+import threading
+import tokenize
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+# Smallest size cap: the head and the tail must each keep at least a few characters
+MIN_CAP_BYTES = 64
+
+
+def _clamp_cap(max_bytes: int) -> int:
+    """Raises a size cap below MIN_CAP_BYTES to it; 0 (no truncation) is kept."""
+    return max_bytes if max_bytes <= 0 else max(max_bytes, MIN_CAP_BYTES)
+
+
+MAX_FILE_BYTES = _clamp_cap(int(os.environ.get("PROJECT_HELPER_MAX_FILE_BYTES", 1024 * 1024)))
+# Context files are whole projects combined, they get a larger cap than single source files
+MAX_CONTEXT_BYTES = _clamp_cap(int(os.environ.get("PROJECT_HELPER_MAX_CONTEXT_BYTES", 4 * 1024 * 1024)))
+CACHE_BUDGET_BYTES = int(os.environ.get("PROJECT_HELPER_READ_CACHE_BYTES", 64 * 1024 * 1024))
+MMAP_THRESHOLD_BYTES = 256 * 1024
+BINARY_SNIFF_BYTES = 8192
+
+BOMS = (
+    (codecs.BOM_UTF32_LE, "utf-32"),
+    (codecs.BOM_UTF32_BE, "utf-32"),
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+
+
+@dataclass
+class FileContent:
+    """
+    A file as read by read_file.
+
+    Attributes:
+        path: Absolute path of the file.
+        text: The decoded text; empty for binary files. When truncated, the head and the tail
+              of the file separated by a "[truncated ...]" marker line.
+        encoding: The detected encoding, None for binary files.
+        size: Size of the file on disk, in bytes.
+        is_binary: Whether the file looks binary (NUL bytes and no UTF-16/32 BOM).
+        truncated: Whether the file was larger than the cap and only its head and tail were kept.
+        guessed_encoding: Whether no encoding decoded the file cleanly and the Latin-1 fallback
+                          was used; the text is readable but may not match the original characters.
+    """
+    path: str
+    text: str
+    encoding: Optional[str]
+    size: int
+    is_binary: bool
+    truncated: bool
+    guessed_encoding: bool = False
+
+
+def _read_bytes(path: str, size: int, max_bytes: int) -> Tuple[bytes, bytes]:
+    """
+    Reads a whole file, or only its head and tail when it is larger than max_bytes.
+
+    Returns:
+        (head, tail); tail is empty unless the file was truncated.
+    """
+    # Multiple of 4 so that the tail of a utf-16/32 file starts on a character boundary
+    half = (max_bytes // 2) & ~3
+    truncate = 0 < max_bytes < size
+    with open(path, 'rb') as f:
+        if size < MMAP_THRESHOLD_BYTES:
+            data = f.read()
+            if truncate:
+                return data[:half], data[len(data) - half:]
+            return data, b""
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            if truncate:
+                return mapped[:half], mapped[size - half:]
+            return mapped[:], b""
+
+
+def _decodes(data: bytes, encoding: str) -> bool:
+    """
+    Checks that data decodes strictly; an incremental decoder accepts a character cut in half
+    at the end of a truncated head.
+    """
+    try:
+        codecs.getincrementaldecoder(encoding)().decode(data, final=False)
+        return True
+    except (UnicodeDecodeError, LookupError):
+        return False
+
+
+def _detect_encoding(data: bytes, path: str) -> Tuple[str, bool]:
+    """
+    Guesses the encoding of the beginning of a file.
+
+    Returns:
+        (encoding, guessed); guessed is True when nothing decoded the data cleanly and the
+        Latin-1 fallback was used.
+    """
+    for bom, encoding in BOMS:
+        if data.startswith(bom):
+            return encoding, not _decodes(data, encoding)
+
+    candidates = []
+    if path.endswith(".py"):
+        # Honours PEP 263 coding cookies, defaults to utf-8
+        try:
+            candidates.append(tokenize.detect_encoding(io.BytesIO(data).readline)[0])
+        except SyntaxError:
+            pass
+    candidates.append("utf-8")
+
+    # The cookie only looks at the first two lines, check the whole head
+    for encoding in candidates:
+        if _decodes(data, encoding):
+            return encoding, False
+    return "latin-1", True
+
+
+def _is_binary(data: bytes) -> bool:
+    sample = data[:BINARY_SNIFF_BYTES]
+    if any(sample.startswith(bom) for bom, _ in BOMS):
+        return False
+    return b"\0" in sample
+
+
+def _load(path: str, max_bytes: int) -> FileContent:
+    size = os.path.getsize(path)
+    head, tail = _read_bytes(path, size, max_bytes)
+    truncated = 0 < max_bytes < size
+    if _is_binary(head):
+        return FileContent(path, "", None, size, True, truncated)
+
+    encoding, guessed = _detect_encoding(head, path)
+    text = head.decode(encoding, errors="replace")
+    if truncated:
+        omitted = size - len(head) - len(tail)
+        # The tail of a utf-16/32 file has no BOM, decode it with the explicit byte order
+        tail_encoding = {"utf-16": "utf-16-le" if head.startswith(codecs.BOM_UTF16_LE) else "utf-16-be",
+                         "utf-32": "utf-32-le" if head.startswith(codecs.BOM_UTF32_LE) else "utf-32-be",
+                         "utf-8-sig": "utf-8"}.get(encoding, encoding)
+        text += (f"\n\n... [truncated {omitted} bytes of {size}] ...\n\n"
+                 + tail.decode(tail_encoding, errors="replace"))
+    return FileContent(path, text, encoding, size, False, truncated, guessed)
+
+
+class ReadCache:
+    """
+    Least recently used cache of FileContent, bounded by the total size of the cached text.
+
+    Entries are keyed by path and size cap, and dropped when the file's modification time or
+    size changed since it was read.
+    """
+
+    def __init__(self, budget_bytes: int = CACHE_BUDGET_BYTES):
+        self.budget_bytes = budget_bytes
+        self._entries: "OrderedDict[Tuple[str, int], Tuple[int, int, FileContent]]" = OrderedDict()
+        self._used_bytes = 0
+        self._lock = threading.Lock()
+
+    def read(self, path: str, max_bytes: int) -> FileContent:
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        key = (path, max_bytes)
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None:
+                mtime_ns, size, content = cached
+                if mtime_ns == stat.st_mtime_ns and size == stat.st_size:
+                    self._entries.move_to_end(key)
+                    return content
+                self._remove(key)
+
+        content = _load(path, max_bytes)
+        cost = len(content.text)
+        if cost <= self.budget_bytes:
+            with self._lock:
+                if key in self._entries:
+                    self._remove(key)
+                self._entries[key] = (stat.st_mtime_ns, stat.st_size, content)
+                self._used_bytes += cost
+                # Evict the least recently used entries until we are back under the budget
+                while self._used_bytes > self.budget_bytes:
+                    self._remove(next(iter(self._entries)))
+        return content
+
+    def _remove(self, key: Tuple[str, int]) -> None:
+        _, _, content = self._entries.pop(key)
+        self._used_bytes -= len(content.text)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._used_bytes = 0
+
+
+_cache = ReadCache()
+
+
+def configure(max_file_bytes: Optional[int] = None, max_context_bytes: Optional[int] = None,
+              cache_budget_bytes: Optional[int] = None) -> None:
+    """
+    Changes the size caps and the cache budget; the cache is cleared. Caps below
+    MIN_CAP_BYTES are raised to it.
+    """
+    global MAX_FILE_BYTES, MAX_CONTEXT_BYTES, _cache
+    if max_file_bytes is not None:
+        MAX_FILE_BYTES = _clamp_cap(max_file_bytes)
+    if max_context_bytes is not None:
+        MAX_CONTEXT_BYTES = _clamp_cap(max_context_bytes)
+    _cache = ReadCache(cache_budget_bytes if cache_budget_bytes is not None else _cache.budget_bytes)
+
+
+def clear_cache() -> None:
+    """
+    Empties the read cache, e.g. between two runs in the same process.
+    """
+    _cache.clear()
+
+
+def read_file(path: str, max_bytes: Optional[int] = None) -> FileContent:
+    """
+    Reads a file through the shared cache.
+
+    Args:
+        path: Path to the file.
+        max_bytes: Size cap, defaults to MAX_FILE_BYTES; 0 disables truncation, and caps below
+                   MIN_CAP_BYTES are raised to it.
+
+    Returns:
+        The FileContent. Raises FileNotFoundError or OSError when the file cannot be read.
+    """
+    return _cache.read(path, MAX_FILE_BYTES if max_bytes is None else _clamp_cap(max_bytes))
+
+
+def read_text(path: str, max_bytes: Optional[int] = None, allow_truncated: bool = True) -> str:
+    """
+    Reads a text file through the shared cache and returns its text.
+
+    Pass allow_truncated=False when the text is going to replace the file: it must then be
+    complete and decoded without guessing.
+
+    Raises:
+        ValueError: if the file is binary, or, when allow_truncated is False, truncated or
+                    without a clean encoding.
+    """
+    content = read_file(path, max_bytes)
+    if content.is_binary:
+        raise ValueError(f"'{path}' is a binary file")
+    if content.truncated and not allow_truncated:
+        raise ValueError(f"'{path}' is too large ({content.size} bytes)")
+    if content.guessed_encoding and not allow_truncated:
+        raise ValueError(f"'{path}' is neither valid utf-8 nor in its declared encoding")
+    return content.text
@@ -0,0 +1,162 @@
+import os
+
+import pytest
+
+import readUtil
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    readUtil.clear_cache()
+    yield
+    readUtil.clear_cache()
+
+
+def write(tmp_path, name, data):
+    path = tmp_path / name
+    path.write_bytes(data)
+    return str(path)
+
+
+def test_small_utf8_file(tmp_path):
+    path = write(tmp_path, "a.py", "print('héllo')\n".encode("utf-8"))
+    content = readUtil.read_file(path)
+    assert content.text == "print('héllo')\n"
+    assert content.encoding == "utf-8"
+    assert not content.truncated and not content.is_binary and not content.guessed_encoding
+
+
+def test_truncated_file_keeps_head_and_tail(tmp_path):
+    path = write(tmp_path, "big.txt", b"a" * 500 + b"b" * 500)
+    content = readUtil.read_file(path, max_bytes=100)
+    assert content.truncated and content.size == 1000
+    head, tail = content.text.split("\n\n... [truncated 904 bytes of 1000] ...\n\n")
+    assert head == "a" * 48 and tail == "b" * 48
+
+
+def test_truncated_file_read_through_mmap(tmp_path):
+    size = readUtil.MMAP_THRESHOLD_BYTES * 2
+    path = write(tmp_path, "huge.txt", b"h" * (size // 2) + b"t" * (size // 2))
+    content = readUtil.read_file(path, max_bytes=1000)
+    assert content.text.startswith("h" * 500) and content.text.endswith("t" * 500)
+    assert f"of {size}]" in content.text
+
+
+def test_zero_max_bytes_disables_truncation(tmp_path):
+    path = write(tmp_path, "big.txt", b"x" * 1000)
+    content = readUtil.read_file(path, max_bytes=0)
+    assert not content.truncated and content.text == "x" * 1000
+
+
+@pytest.mark.parametrize("encoding", ["utf-16-le", "utf-16-be", "utf-32-le", "utf-32-be"])
+def test_truncated_utf16_utf32_tail(tmp_path, encoding):
+    # The BOM gives the byte order of the head, the tail has to be decoded with it too
+    bom = "﻿".encode(encoding)
+    path = write(tmp_path, "wide.txt", bom + ("é" * 200 + "ü" * 200).encode(encoding))
+    content = readUtil.read_file(path, max_bytes=400)
+    assert not content.is_binary and content.truncated
+    head, tail = content.text.split("] ...\n\n")
+    assert set(head.split("\n\n...")[0]) == {"é"}
+    assert set(tail) == {"ü"}
+
+
+def test_utf8_bom(tmp_path):
+    path = write(tmp_path, "bom.py", b"\xef\xbb\xbfx = 1\n")
+    content = readUtil.read_file(path)
+    assert content.encoding == "utf-8-sig" and content.text == "x = 1\n"
+
+
+def test_binary_file(tmp_path):
+    path = write(tmp_path, "data.bin", b"\x00\x01\x02binary")
+    content = readUtil.read_file(path)
+    assert content.is_binary and content.text == "" and content.encoding is None
+    with pytest.raises(ValueError):
+        readUtil.read_text(path)
+
+
+def test_coding_cookie(tmp_path):
+    path = write(tmp_path, "latin.py", "# -*- coding: latin-1 -*-\nname = 'café'\n".encode("latin-1"))
+    content = readUtil.read_file(path)
+    assert content.encoding == "iso-8859-1" and not content.guessed_encoding
+    assert "café" in content.text
+
+
+def test_undecodable_file_is_guessed(tmp_path):
+    # No cookie and invalid utf-8 after the first two lines
+    path = write(tmp_path, "bad.py", b"x = 1\ny = 2\nname = 'caf\xe9'\n")
+    content = readUtil.read_file(path)
+    assert content.encoding == "latin-1" and content.guessed_encoding
+    assert readUtil.read_text(path) == content.text
+    with pytest.raises(ValueError):
+        readUtil.read_text(path, allow_truncated=False)
+
+
+def test_read_text_refuses_truncated_when_asked(tmp_path):
+    path = write(tmp_path, "big.py", b"x = 1\n" * 100)
+    assert "[truncated" in readUtil.read_text(path, max_bytes=100)
+    with pytest.raises(ValueError):
+        readUtil.read_text(path, max_bytes=100, allow_truncated=False)
+
+
+def test_missing_file(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        readUtil.read_file(str(tmp_path / "missing.py"))
+
+
+def test_cache_hit_and_invalidation(tmp_path):
+    cache = readUtil.ReadCache(budget_bytes=1000)
+    path = write(tmp_path, "a.py", b"x = 1\n")
+    first = cache.read(path, 0)
+    assert cache.read(path, 0) is first
+
+    # A changed file is read again
+    with open(path, "wb") as f:
+        f.write(b"x = 22\n")
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    second = cache.read(path, 0)
+    assert second is not first and second.text == "x = 22\n"
+
+
+def test_cache_eviction_by_budget(tmp_path):
+    cache = readUtil.ReadCache(budget_bytes=250)
+    paths = [write(tmp_path, f"{name}.txt", name.encode() * 100) for name in "abc"]
+    a = cache.read(paths[0], 0)
+    b = cache.read(paths[1], 0)
+    # a is now the most recently used, reading c evicts b
+    assert cache.read(paths[0], 0) is a
+    cache.read(paths[2], 0)
+    assert cache.read(paths[0], 0) is a
+    assert cache.read(paths[1], 0) is not b
+
+
+def test_cache_skips_entries_larger_than_budget(tmp_path):
+    cache = readUtil.ReadCache(budget_bytes=10)
+    path = write(tmp_path, "big.txt", b"x" * 100)
+    assert cache.read(path, 0) is not cache.read(path, 0)
+
+
+@pytest.mark.parametrize("max_bytes", [1, 6, 7])
+def test_tiny_caps_are_clamped(tmp_path, max_bytes):
+    path = write(tmp_path, "big.txt", b"a" * 500 + b"b" * 500)
+    content = readUtil.read_file(path, max_bytes=max_bytes)
+    assert content.truncated
+    half = readUtil.MIN_CAP_BYTES // 2
+    assert content.text.startswith("a" * half) and content.text.endswith("b" * half)
+    with pytest.raises(ValueError):
+        readUtil.read_text(path, max_bytes=max_bytes, allow_truncated=False)
+
+
+def test_configure_clamps_caps(monkeypatch):
+    monkeypatch.setattr(readUtil, "MAX_FILE_BYTES", readUtil.MAX_FILE_BYTES)
+    monkeypatch.setattr(readUtil, "MAX_CONTEXT_BYTES", readUtil.MAX_CONTEXT_BYTES)
+    monkeypatch.setattr(readUtil, "_cache", readUtil._cache)
+    readUtil.configure(max_file_bytes=6, max_context_bytes=0)
+    assert readUtil.MAX_FILE_BYTES == readUtil.MIN_CAP_BYTES
+    assert readUtil.MAX_CONTEXT_BYTES == 0
+
+
+def test_truncated_binary_file(tmp_path):
+    path = write(tmp_path, "data.bin", b"\x00" * 1000)
+    content = readUtil.read_file(path, max_bytes=100)
+    assert content.is_binary and content.truncated
@@ -0,0 +1,360 @@
+"""
+Compact representation of a folder scan, for very large trees.
+
+generate_tree_with_functions returns every absolute path plus the whole rendered tree as
+one string. ScanResult keeps the same information in flat arrays instead:
+
+- every file and folder name is stored once in a name table,
+- folders are (parent folder, name) pairs, so a path prefix is shared by everything below it,
+- tree entries and function/class outlines are array columns, a file pointing to its
+  outline through [start, end) offsets.
+
+Tree text is rendered lazily, as an iterator of lines or page by page, and the result is
+saved as gzipped JSON lines that combine_scan (fileUtil) reads directly. The line of an entry
+and the prefix of its tree branch are computed from the arrays, so a page is rendered without
+rendering the lines before it, and load_scan keeps recently read scan files in memory.
+"""
+import functools
+import gzip
+import json
+import os
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import islice
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from treeList import parse_definitions, render_definitions
+
+FORMAT_NAME = "project_helper.scan"
+FORMAT_VERSION = 1
+
+# Entry kinds
+DIR, FILE, OTHER, NOTICE = 0, 1, 2, 3
+# Outline kinds, in the same order as the kinds returned by parse_definitions
+OUTLINE_KINDS = ("function", "class", "method", "unparsable")
+UNPARSABLE = 3
+NO_PARENT = -1
+
+ARRAY_TYPECODES = {
+    "dir_parent": "i", "dir_name": "I",
+    "entry_kind": "b", "entry_depth": "H", "entry_last": "b", "entry_name": "I", "entry_dir": "I",
+    "entry_outline_start": "I", "entry_outline_end": "I",
+    "outline_kind": "b", "outline_name": "I",
+    "file_entry": "I",
+}
+
+
+class ScanEntry:
+    """
+    Lightweight view on one entry of a ScanResult; it holds no data of its own.
+    """
+    __slots__ = ("_scan", "index")
+
+    def __init__(self, scan: "ScanResult", index: int):
+        self._scan = scan
+        self.index = index
+
+    @property
+    def kind(self) -> int:
+        return self._scan.entry_kind[self.index]
+
+    @property
+    def name(self) -> str:
+        return self._scan.names[self._scan.entry_name[self.index]]
+
+    @property
+    def depth(self) -> int:
+        return self._scan.entry_depth[self.index]
+
+    @property
+    def path(self) -> str:
+        return os.path.join(self._scan.dir_path(self._scan.entry_dir[self.index]), self.name)
+
+    @property
+    def outline(self) -> Optional[List[Tuple[str, str]]]:
+        return self._scan.outline(self.index)
+
+    def __repr__(self) -> str:
+        return f"ScanEntry({self.index}, {self.path!r})"
+
+
+class ScanResult:
+    """
+    Scan of a folder stored in flat arrays, see the module docstring.
+
+    Attributes:
+        root: Absolute path of the scanned folder.
+        error: Error message when the folder could not be scanned, None otherwise.
+        names: Table of the distinct names, referenced by index from the arrays.
+        file_entry: Entry index of each numbered file, file id N being at position N - 1.
+    """
+    __slots__ = ("root", "error", "names", "_name_index", "_dir_entry") + tuple(ARRAY_TYPECODES)
+
+    def __init__(self, root: str, error: Optional[str] = None):
+        self.root = root
+        self.error = error
+        self.names: List[str] = []
+        self._name_index: Dict[str, int] = {}
+        self._dir_entry: Optional[array] = None
+        for column, typecode in ARRAY_TYPECODES.items():
+            setattr(self, column, array(typecode))
+        # Folder 0 is the root itself
+        self.dir_parent.append(NO_PARENT)
+        self.dir_name.append(self._intern(root))
+
+    def _intern(self, name: str) -> int:
+        index = self._name_index.get(name)
+        if index is None:
+            index = len(self.names)
+            self.names.append(name)
+            self._name_index[name] = index
+        return index
+
+    def add_dir(self, parent: int, name: str) -> int:
+        """Registers a folder and returns its index."""
+        self._dir_entry = None
+        self.dir_parent.append(parent)
+        self.dir_name.append(self._intern(name))
+        return len(self.dir_parent) - 1
+
+    def add_entry(self, kind: int, depth: int, is_last: bool, name: str, dir_index: int,
+                  definitions: Optional[List[Tuple[str, str]]] = None) -> int:
+        """
+        Appends a tree entry, in display order. Numbered files (FILE) get the next file id
+        and their definitions (the output of parse_definitions) as outline.
+
+        Returns:
+            The index of the entry.
+        """
+        index = len(self.entry_kind)
+        self.entry_kind.append(kind)
+        self.entry_depth.append(depth)
+        self.entry_last.append(1 if is_last else 0)
+        self.entry_name.append(self._intern(name))
+        self.entry_dir.append(dir_index)
+        self.entry_outline_start.append(len(self.outline_kind))
+        if kind == FILE:
+            self.file_entry.append(index)
+            if definitions is None:
+                self.outline_kind.append(UNPARSABLE)
+                self.outline_name.append(self._intern(""))
+            else:
+                for definition_kind, definition_name in definitions:
+                    self.outline_kind.append(OUTLINE_KINDS.index(definition_kind))
+                    self.outline_name.append(self._intern(definition_name))
+        self.entry_outline_end.append(len(self.outline_kind))
+        return index
+
+    @property
+    def file_count(self) -> int:
+        return len(self.file_entry)
+
+    @property
+    def line_count(self) -> int:
+        """Number of lines of the rendered tree."""
+        if self.error is not None:
+            return 1
+        return 1 + len(self.entry_kind) + len(self.outline_kind)
+
+    def dir_path(self, dir_index: int) -> str:
+        """Rebuilds the absolute path of a folder from its chain of parents."""
+        parts = []
+        while dir_index != NO_PARENT:
+            parts.append(self.names[self.dir_name[dir_index]])
+            dir_index = self.dir_parent[dir_index]
+        return os.path.join(*reversed(parts))
+
+    def entry(self, index: int) -> ScanEntry:
+        return ScanEntry(self, index)
+
+    def outline(self, index: int) -> Optional[List[Tuple[str, str]]]:
+        """Returns the definitions of an entry, in the parse_definitions format."""
+        start, end = self.entry_outline_start[index], self.entry_outline_end[index]
+        if end - start == 1 and self.outline_kind[start] == UNPARSABLE:
+            return None
+        return [(OUTLINE_KINDS[self.outline_kind[i]], self.names[self.outline_name[i]]) for i in range(start, end)]
+
+    def file_path(self, file_id: int) -> str:
+        return self.entry(self.file_entry[file_id - 1]).path
+
+    def iter_files(self) -> Iterator[Tuple[int, str]]:
+        """Yields (file id, absolute path) of the numbered files, in id order."""
+        for file_id in range(1, self.file_count + 1):
+            yield file_id, self.file_path(file_id)
+
+    def path_dictionary(self) -> Dict[int, str]:
+        """Returns the file map of generate_tree_with_functions, for existing callers."""
+        return dict(self.iter_files())
+
+    def line_of_entry(self, index: int) -> int:
+        """Line of the rendered tree where an entry starts: the root line, then one line per
+        entry and per outline item before it."""
+        return 1 + index + self.entry_outline_start[index]
+
+    def _branch_prefixes(self, index: int) -> List[str]:
+        """
+        Returns the prefixes of the entries at depth 0 to the depth of an entry, as
+        iter_tree_lines has them when it reaches that entry: each ancestor folder adds a
+        "│   " or, when it is the last of its parent, a "    " segment.
+        """
+        if self._dir_entry is None:
+            # Folder k (k >= 1) is registered right after the k-th DIR entry
+            self._dir_entry = array("I", [0])
+            self._dir_entry.extend(i for i, kind in enumerate(self.entry_kind) if kind == DIR)
+        segments = []
+        dir_index = self.entry_dir[index]
+        while dir_index > 0:
+            segments.append("    " if self.entry_last[self._dir_entry[dir_index]] else "│   ")
+            dir_index = self.dir_parent[dir_index]
+        segments.reverse()
+        return ["".join(segments[:depth]) for depth in range(len(segments) + 1)]
+
+    def iter_tree_lines(self, start: int = 0) -> Iterator[str]:
+        """
+        Renders the tree one line at a time, exactly as generate_tree_with_functions does.
+
+        Args:
+            start: First line to render; rendering starts at its entry, the lines before it
+                   are never built.
+        """
+        if self.error is not None:
+            if start <= 0:
+                yield self.error
+            return
+
+        if start <= 0:
+            yield f"🌳 {os.path.basename(self.root)}/"
+            first, skip = 0, 0
+        else:
+            first = bisect_right(range(len(self.entry_kind)), start, key=self.line_of_entry) - 1
+            if first < 0:
+                return
+            skip = start - self.line_of_entry(first)
+        lines = self._iter_entry_lines(first)
+        if skip:
+            next(islice(lines, skip - 1, skip), None)
+        yield from lines
+
+    def _iter_entry_lines(self, first: int) -> Iterator[str]:
+        # prefixes[d] is the prefix of the entries at depth d
+        prefixes = self._branch_prefixes(first) if first else [""]
+        for index in range(first, len(self.entry_kind)):
+            kind = self.entry_kind[index]
+            depth = self.entry_depth[index]
+            is_last = self.entry_last[index]
+            name = self.names[self.entry_name[index]]
+            prefix = prefixes[depth]
+            connector = "└── " if is_last else "├── "
+            child_prefix = prefix + ("    " if is_last else "│   ")
+
+            if kind == DIR:
+                yield f"{prefix}{connector}{name}/"
+                del prefixes[depth + 1:]
+                prefixes.append(child_prefix)
+            elif kind == FILE:
+                yield f"{prefix}{connector}[{self.file_id_of(index)}] {name}"
+                yield from render_definitions(self.outline(index), child_prefix)
+            else:
+                yield f"{prefix}{connector}{name}"
+
+    def file_id_of(self, index: int) -> int:
+        """Returns the file id of a FILE entry; file_entry is sorted, so this is a binary search."""
+        return bisect_left(self.file_entry, index) + 1
+
+    @property
+    def tree_string(self) -> str:
+        """The whole rendered tree; prefer iter_tree_lines or render_page on large trees."""
+        return "\n".join(self.iter_tree_lines())
+
+    def render_page(self, page: int, page_size: int = 500) -> str:
+        """Renders lines [page * page_size, (page + 1) * page_size) of the tree."""
+        return "\n".join(islice(self.iter_tree_lines(page * page_size), page_size))
+
+    def save(self, path: str) -> None:
+        """
+        Writes the scan as JSON lines, gzipped when path ends with .gz: a header line,
+        then one line per column.
+        """
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, 'wt', encoding='utf-8') as f:
+            header = {"format": FORMAT_NAME, "version": FORMAT_VERSION, "root": self.root, "error": self.error}
+            f.write(json.dumps(header, ensure_ascii=False) + "\n")
+            f.write(json.dumps({"column": "names", "data": self.names}, ensure_ascii=False) + "\n")
+            for column in ARRAY_TYPECODES:
+                f.write(json.dumps({"column": column, "data": getattr(self, column).tolist()}) + "\n")
+
+    @classmethod
+    def load(cls, path: str) -> "ScanResult":
+        """Reads a scan written by save()."""
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, 'rt', encoding='utf-8') as f:
+            header = json.loads(f.readline())
+            if header.get("format") != FORMAT_NAME or header.get("version") != FORMAT_VERSION:
+                raise ValueError(f"'{path}' is not a scan file of version {FORMAT_VERSION}")
+            scan = cls(header["root"], header["error"])
+            for line in f:
+                record = json.loads(line)
+                column = record["column"]
+                if column == "names":
+                    scan.names = record["data"]
+                    scan._name_index = {name: i for i, name in enumerate(scan.names)}
+                elif column in ARRAY_TYPECODES:
+                    setattr(scan, column, array(ARRAY_TYPECODES[column], record["data"]))
+        return scan
+
+
+@functools.lru_cache(maxsize=4)
+def _load_scan(path: str, mtime_ns: int, size: int) -> ScanResult:
+    return ScanResult.load(path)
+
+
+def load_scan(path: str) -> ScanResult:
+    """
+    Reads a scan file, keeping the last few in memory so paging through one does not decode
+    it again on every page. A scan file that changed on disk is read again.
+    """
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    return _load_scan(path, stat.st_mtime_ns, stat.st_size)
+
+
+def _scan_dir(scan: ScanResult, current_path: str, dir_index: int, depth: int) -> None:
+    """
+    Recursively adds the content of a folder, following the rules of treeList._walk_dir.
+    """
+    try:
+        entries = sorted([e for e in os.listdir(current_path) if not e.startswith('.')])
+    except PermissionError:
+        scan.add_entry(NOTICE, depth, True, "[Permission Denied]", dir_index)
+        return
+
+    for i, entry in enumerate(entries):
+        is_last = (i == len(entries) - 1)
+        path = os.path.join(current_path, entry)
+
+        if entry.endswith('.py') or entry.endswith('.toml') or entry.endswith('.md'):
+            scan.add_entry(FILE, depth, is_last, entry, dir_index, parse_definitions(path))
+
+        elif os.path.isdir(path):
+            scan.add_entry(DIR, depth, is_last, entry, dir_index)
+            _scan_dir(scan, path, scan.add_dir(dir_index, entry), depth + 1)
+        else:
+            scan.add_entry(OTHER, depth, is_last, entry, dir_index)
+
+
+async def scan_tree(start_path: str) -> ScanResult:
+    """
+    Scans a folder like generate_tree_with_functions, into a compact ScanResult.
+
+    Args:
+        start_path: The root directory to start scanning from.
+
+    Returns:
+        The scan; its error attribute is set when start_path is not a directory.
+    """
+    if not os.path.isdir(start_path):
+        return ScanResult(start_path, f"Error: Provided path '{start_path}' is not a directory.")
+
+    scan = ScanResult(os.path.abspath(start_path))
+    _scan_dir(scan, scan.root, 0, 0)
+    return scan
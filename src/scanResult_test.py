@@ -0,0 +1,130 @@
+import asyncio
+import os
+
+import pytest
+
+from scanResult import ScanResult, load_scan, scan_tree
+from treeList import generate_tree_with_functions
+
+
+@pytest.fixture
+def tree(tmp_path):
+    # A small project with nested folders, hidden entries, an unparsable file and other files
+    root = tmp_path / "project"
+    (root / "pkg" / "sub").mkdir(parents=True)
+    (root / "empty").mkdir()
+    (root / ".hidden").mkdir()
+    (root / "main.py").write_text("def main():\n    pass\n\nclass App:\n    def run(self):\n        pass\n")
+    (root / "README.md").write_text("# Project\n")
+    (root / "pyproject.toml").write_text("[tool.poetry]\n")
+    (root / "data.csv").write_text("a,b\n")
+    (root / "pkg" / "__init__.py").write_text("")
+    (root / "pkg" / "broken.py").write_text("def broken(:\n")
+    (root / "pkg" / "sub" / "util.py").write_text("async def fetch():\n    pass\n")
+    (root / "pkg" / "sub" / "notes.txt").write_text("notes\n")
+    return str(root)
+
+
+def assert_same_as_tree_list(path):
+    tree_string, path_dictionary = asyncio.run(generate_tree_with_functions(path))
+    scan = asyncio.run(scan_tree(path))
+    assert scan.tree_string == tree_string
+    assert scan.path_dictionary() == path_dictionary
+    assert scan.line_count == len(tree_string.split("\n"))
+    return scan
+
+
+def test_render_matches_generate_tree_with_functions(tree):
+    scan = assert_same_as_tree_list(tree)
+    assert scan.file_count == 6
+
+
+def test_render_matches_on_the_repo():
+    assert_same_as_tree_list(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def test_not_a_directory(tmp_path):
+    assert_same_as_tree_list(str(tmp_path / "missing"))
+
+
+def test_empty_directory(tmp_path):
+    scan = assert_same_as_tree_list(str(tmp_path))
+    assert scan.file_count == 0
+
+
+@pytest.mark.parametrize("name", ["scan.jsonl", "scan.jsonl.gz"])
+def test_save_load_round_trip(tree, tmp_path, name):
+    scan = asyncio.run(scan_tree(tree))
+    path = str(tmp_path / name)
+    scan.save(path)
+    loaded = ScanResult.load(path)
+    assert loaded.root == scan.root and loaded.error is None
+    assert loaded.tree_string == scan.tree_string
+    assert loaded.path_dictionary() == scan.path_dictionary()
+    assert [loaded.outline(i) for i in range(len(loaded.entry_kind))] == \
+           [scan.outline(i) for i in range(len(scan.entry_kind))]
+
+
+def test_load_rejects_other_files(tmp_path):
+    path = tmp_path / "other.jsonl"
+    path.write_text('{"format": "something else"}\n')
+    with pytest.raises(ValueError):
+        ScanResult.load(str(path))
+
+
+def test_render_page(tree):
+    scan = asyncio.run(scan_tree(tree))
+    lines = scan.tree_string.split("\n")
+    pages = [scan.render_page(page, 4) for page in range(-(-len(lines) // 4))]
+    assert "\n".join(pages) == scan.tree_string
+    assert scan.render_page(len(pages), 4) == ""
+
+
+def test_file_ids(tree):
+    scan = asyncio.run(scan_tree(tree))
+    for file_id, path in scan.iter_files():
+        index = scan.file_entry[file_id - 1]
+        assert scan.file_id_of(index) == file_id
+        assert scan.entry(index).path == path == scan.file_path(file_id)
+    assert scan.outline(scan.file_entry[0]) is not None
+
+
+def test_iter_tree_lines_from_any_line(tree):
+    scan = asyncio.run(scan_tree(tree))
+    lines = scan.tree_string.split("\n")
+    for start in range(len(lines) + 2):
+        assert list(scan.iter_tree_lines(start)) == lines[start:]
+
+
+def test_pages_of_a_deep_tree(tmp_path):
+    # Nested folders that are last or not of their parent, so the resumed prefixes mix both segments
+    for path in ["a/b/c/d", "a/b/z", "a/y", "x/w/v"]:
+        (tmp_path / path).mkdir(parents=True)
+        (tmp_path / path / "m.py").write_text("def f():\n    pass\n\nclass C:\n    def g(self):\n        pass\n")
+        (tmp_path / path / "n.txt").write_text("")
+    scan = asyncio.run(scan_tree(str(tmp_path)))
+    lines = scan.tree_string.split("\n")
+    for page_size in (1, 2, 3, 7):
+        pages = [scan.render_page(page, page_size) for page in range(-(-len(lines) // page_size))]
+        assert "\n".join(pages) == scan.tree_string
+
+
+def test_line_of_entry(tree):
+    scan = asyncio.run(scan_tree(tree))
+    lines = scan.tree_string.split("\n")
+    for index in range(len(scan.entry_kind)):
+        assert lines[scan.line_of_entry(index)].endswith(scan.entry(index).name + ("/" if scan.entry_kind[index] == 0 else ""))
+
+
+def test_load_scan_is_cached_until_the_file_changes(tree, tmp_path):
+    scan = asyncio.run(scan_tree(tree))
+    path = str(tmp_path / "scan.jsonl.gz")
+    scan.save(path)
+    loaded = load_scan(path)
+    assert load_scan(path) is loaded
+
+    scan.error = "changed"
+    scan.save(path)
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert load_scan(path).error == "changed"
@@ -1,7 +1,9 @@
 import os
 import ast
 import sys
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
+
+import readUtil
 
 
 async def generate_tree_with_functions(start_path: str) -> Tuple[str, Dict[int, str]]:
@@ -35,41 +37,72 @@ async def generate_tree_with_functions(start_path: str) -> Tuple[str, Dict[int,
     return "\n".join(tree_lines), file_map
 
 
-def _list_py_contents(file_path: str, base_prefix: str = "") -> List[str]:
+def parse_definitions(file_path: str) -> Optional[List[Tuple[str, str]]]:
     """
-    Parses a Python file and returns a list of strings representing its contents.
+    Parses a Python file and lists its top-level functions and classes, with the methods
+    of each class right after it.
+
+    Returns:
+        A list of (kind, name) where kind is "function", "class" or "method",
+        or None if the file could not be parsed.
     """
-    lines = []
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            source = f.read()
-        tree = ast.parse(source)
-    except (SyntaxError, UnicodeDecodeError, FileNotFoundError):
-        lines.append(f"{base_prefix}└── [Could not parse file]")
-        return lines
+        content = readUtil.read_file(file_path)
+        # A truncated file cannot be parsed as a whole
+        if content.is_binary or content.truncated:
+            return None
+        tree = ast.parse(content.text)
+    except (SyntaxError, ValueError, FileNotFoundError):
+        return None
+
+    definitions = []
+    for node in tree.body:
+        if isinstance(node, ast.FunctionDef):
+            definitions.append(("function", node.name))
+        elif isinstance(node, ast.ClassDef):
+            definitions.append(("class", node.name))
+            definitions.extend(("method", m.name) for m in node.body if isinstance(m, ast.FunctionDef))
+    return definitions
+
 
-    definitions = [node for node in tree.body if isinstance(node, (ast.FunctionDef, ast.ClassDef))]
+def render_definitions(definitions: Optional[List[Tuple[str, str]]], base_prefix: str = "") -> List[str]:
+    """
+    Renders the output of parse_definitions as tree lines.
+    """
+    if definitions is None:
+        return [f"{base_prefix}└── [Could not parse file]"]
 
-    for i, node in enumerate(definitions):
-        is_last_def = (i == len(definitions) - 1)
+    lines = []
+    top_level = [i for i, (kind, _) in enumerate(definitions) if kind != "method"]
+    for position, i in enumerate(top_level):
+        kind, name = definitions[i]
+        is_last_def = (position == len(top_level) - 1)
         connector = "└── " if is_last_def else "├── "
 
-        if isinstance(node, ast.FunctionDef):
-            lines.append(f"{base_prefix}{connector}𝑓 {node.name}()")
+        if kind == "function":
+            lines.append(f"{base_prefix}{connector}𝑓 {name}()")
 
-        elif isinstance(node, ast.ClassDef):
-            lines.append(f"{base_prefix}{connector}𝐂 {node.name}")
+        else:
+            lines.append(f"{base_prefix}{connector}𝐂 {name}")
 
             method_prefix = base_prefix + ("    " if is_last_def else "│   ")
-            methods = [m for m in node.body if isinstance(m, ast.FunctionDef)]
+            end = top_level[position + 1] if position + 1 < len(top_level) else len(definitions)
+            methods = definitions[i + 1:end]
 
-            for j, method in enumerate(methods):
+            for j, (_, method_name) in enumerate(methods):
                 is_last_method = (j == len(methods) - 1)
                 method_connector = "└── " if is_last_method else "├── "
-                lines.append(f"{method_prefix}{method_connector}𝑓 {method.name}()")
+                lines.append(f"{method_prefix}{method_connector}𝑓 {method_name}()")
     return lines
 
 
+def _list_py_contents(file_path: str, base_prefix: str = "") -> List[str]:
+    """
+    Parses a Python file and returns a list of strings representing its contents.
+    """
+    return render_definitions(parse_definitions(file_path), base_prefix)
+
+
 def _walk_dir(current_path: str, prefix: str, file_counter: List[int], file_map: Dict[int, str]) -> List[str]:
     """
     Recursively walks a directory, returning its structure as a list of strings.
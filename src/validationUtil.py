@@ -0,0 +1,170 @@
+"""
+Runs generated test files in isolated pytest subprocesses and collects their outcome.
+
+Each test file gets its own interpreter, working directory and JUnit report, and is killed
+once its timeout is reached. The generated code is untrusted: it runs with a minimal
+environment (no API keys or credentials, HOME in a throwaway folder). A ValidationPool
+bounds how many run at the same time (one per core by default), so validation can go on
+while new tests are still generated.
+"""
+import asyncio
+import importlib.util
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import xml.etree.ElementTree as ElementTree
+from typing import Dict, Optional
+
+DEFAULT_FILE_TIMEOUT = 300.0
+DEFAULT_PER_TEST_TIMEOUT = 60.0
+OUTPUT_TAIL_CHARS = 4000
+
+# Environment variables passed on to the test subprocess, everything else is dropped
+SANDBOX_ENV_KEEP = ("PATH", "PYTHONPATH", "LANG", "LC_ALL", "SYSTEMROOT")
+
+# pytest exit codes, see https://docs.pytest.org/en/stable/reference/exit-codes.html
+EXIT_STATUS = {
+    0: "passed",
+    1: "failed",
+    2: "collection_error",
+    3: "internal_error",
+    4: "usage_error",
+    5: "no_tests",
+}
+
+
+def _read_junit_counts(junit_path: str) -> Dict[str, int]:
+    """
+    Reads the test counts of a pytest JUnit XML report. Missing or broken reports give zeros.
+    """
+    counts = {"tests": 0, "failures": 0, "errors": 0, "skipped": 0}
+    try:
+        root = ElementTree.parse(junit_path).getroot()
+    except (OSError, ElementTree.ParseError):
+        return counts
+    suites = [root] if root.tag == "testsuite" else root.findall("testsuite")
+    for suite in suites:
+        for name in counts:
+            counts[name] += int(suite.get(name, 0))
+    return counts
+
+
+def _sandbox_env(home: str) -> Dict[str, str]:
+    """
+    Builds the environment of a test subprocess: only SANDBOX_ENV_KEEP from the parent,
+    with HOME and the temporary folder pointing to home.
+    """
+    env = {name: os.environ[name] for name in SANDBOX_ENV_KEEP if name in os.environ}
+    env.update(HOME=home, USERPROFILE=home, TMPDIR=home, TEMP=home, TMP=home, PYTHONDONTWRITEBYTECODE="1")
+    return env
+
+
+def _kill(process: asyncio.subprocess.Process) -> None:
+    """
+    Kills a test subprocess along with anything it spawned.
+    """
+    try:
+        if hasattr(os, "killpg"):
+            os.killpg(process.pid, signal.SIGKILL)
+        else:
+            process.kill()
+    except ProcessLookupError:
+        pass
+
+
+async def validate_test_file(test_path: str, timeout: float = DEFAULT_FILE_TIMEOUT,
+                             per_test_timeout: float = DEFAULT_PER_TEST_TIMEOUT) -> dict:
+    """
+    Runs one test file with pytest in a separate process.
+
+    The process runs from the directory of the test file, in its own session so it can be
+    killed with its children, with a minimal environment (see _sandbox_env). When the
+    pytest-timeout plugin is installed, every single test is also limited to per_test_timeout
+    seconds; the result tells whether it was.
+
+    Args:
+        test_path: Path to the test file to run.
+        timeout: Maximum number of seconds for the whole file.
+        per_test_timeout: Maximum number of seconds for one test (needs pytest-timeout).
+
+    Returns:
+        A dictionary with test_path, status (passed, failed, collection_error, no_tests,
+        timeout, ...), the passed/failed/errors/skipped counts, per_test_timeout_applied and
+        the tail of the pytest output.
+    """
+    test_path = os.path.abspath(test_path)
+    per_test_timeout_applied = importlib.util.find_spec("pytest_timeout") is not None
+    result = {"test_path": test_path, "status": "error", "passed": 0, "failed": 0,
+              "errors": 0, "skipped": 0, "per_test_timeout_applied": per_test_timeout_applied,
+              "output": ""}
+    if not os.path.isfile(test_path):
+        result["output"] = f"Test file not found: {test_path}"
+        return result
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        junit_path = os.path.join(temp_dir, "report.xml")
+        command = [sys.executable, "-m", "pytest", "-q", "-p", "no:cacheprovider",
+                   f"--junitxml={junit_path}", os.path.basename(test_path)]
+        if per_test_timeout_applied:
+            command.append(f"--timeout={per_test_timeout}")
+
+        env = _sandbox_env(temp_dir)
+        process = await asyncio.create_subprocess_exec(
+            *command,
+            cwd=os.path.dirname(test_path),
+            env=env,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            start_new_session=True,
+        )
+        try:
+            output, _ = await asyncio.wait_for(process.communicate(), timeout)
+        except asyncio.TimeoutError:
+            _kill(process)
+            await process.wait()
+            result["status"] = "timeout"
+            result["output"] = f"Timed out after {timeout} seconds"
+            return result
+
+        counts = _read_junit_counts(junit_path)
+
+    result["status"] = EXIT_STATUS.get(process.returncode, "error")
+    result["failed"] = counts["failures"]
+    result["errors"] = counts["errors"]
+    result["skipped"] = counts["skipped"]
+    result["passed"] = max(0, counts["tests"] - counts["failures"] - counts["errors"] - counts["skipped"])
+    result["output"] = output.decode("utf-8", errors="replace")[-OUTPUT_TAIL_CHARS:]
+    return result
+
+
+def format_feedback(result: dict) -> str:
+    """
+    Turns a failed validation result into feedback for regenerating the tests.
+    """
+    return (f"The previous tests ended with status '{result['status']}' "
+            f"({result['passed']} passed, {result['failed']} failed, {result['errors']} errors). "
+            f"pytest output:\n{result['output']}")
+
+
+class ValidationPool:
+    """
+    Validates test files concurrently, with at most max_workers pytest processes at a time.
+
+    Callers run validate() from their own tasks; the pool only bounds how many pytest
+    processes are alive at once.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, timeout: float = DEFAULT_FILE_TIMEOUT,
+                 per_test_timeout: float = DEFAULT_PER_TEST_TIMEOUT):
+        self._semaphore = asyncio.Semaphore(max_workers or os.cpu_count() or 1)
+        self._timeout = timeout
+        self._per_test_timeout = per_test_timeout
+
+    async def validate(self, test_path: str) -> dict:
+        """
+        Validates one test file, waiting for a free worker first.
+        """
+        async with self._semaphore:
+            return await validate_test_file(test_path, self._timeout, self._per_test_timeout)
@@ -0,0 +1,109 @@
+import asyncio
+import importlib.util
+import os
+
+import pytest
+
+import validationUtil
+
+
+def write_test(tmp_path, body, name="generated_test.py"):
+    path = tmp_path / name
+    path.write_text(body)
+    return str(path)
+
+
+def validate(path, **kwargs):
+    return asyncio.run(validationUtil.validate_test_file(path, **kwargs))
+
+
+def test_passed(tmp_path):
+    path = write_test(tmp_path, "def test_one():\n    assert True\n\ndef test_two():\n    assert 1 + 1 == 2\n")
+    result = validate(path)
+    assert result["status"] == "passed"
+    assert (result["passed"], result["failed"], result["errors"], result["skipped"]) == (2, 0, 0, 0)
+    assert result["test_path"] == path
+    assert result["per_test_timeout_applied"] == (importlib.util.find_spec("pytest_timeout") is not None)
+
+
+def test_failed_counts(tmp_path):
+    path = write_test(tmp_path, "import pytest\n\n"
+                                "def test_ok():\n    assert True\n\n"
+                                "def test_ko():\n    assert 1 == 2\n\n"
+                                "@pytest.fixture\ndef broken():\n    raise RuntimeError('fixture')\n\n"
+                                "def test_error(broken):\n    pass\n\n"
+                                "@pytest.mark.skip\ndef test_skipped():\n    pass\n")
+    result = validate(path)
+    assert result["status"] == "failed"
+    assert (result["passed"], result["failed"], result["errors"], result["skipped"]) == (1, 1, 1, 1)
+    assert "test_ko" in result["output"]
+
+
+def test_collection_error(tmp_path):
+    path = write_test(tmp_path, "import module_that_does_not_exist\n\ndef test_one():\n    pass\n")
+    result = validate(path)
+    assert result["status"] == "collection_error"
+    assert result["passed"] == 0 and result["errors"] == 1
+    assert "module_that_does_not_exist" in result["output"]
+
+
+def test_no_tests(tmp_path):
+    result = validate(write_test(tmp_path, "x = 1\n"))
+    assert result["status"] == "no_tests"
+
+
+def test_file_timeout(tmp_path):
+    path = write_test(tmp_path, "import time\n\ndef test_slow():\n    time.sleep(30)\n")
+    result = validate(path, timeout=2)
+    assert result["status"] == "timeout"
+    assert "2" in result["output"]
+
+
+def test_missing_file(tmp_path):
+    result = validate(str(tmp_path / "missing_test.py"))
+    assert result["status"] == "error" and "not found" in result["output"]
+
+
+def test_runs_with_a_minimal_environment(tmp_path, monkeypatch):
+    monkeypatch.setenv("GEMINI_API_KEY", "secret")
+    path = write_test(tmp_path, "import os\n\n"
+                                "def test_env():\n"
+                                "    assert 'GEMINI_API_KEY' not in os.environ\n"
+                                f"    assert os.environ['HOME'] != {os.environ.get('HOME', '')!r}\n")
+    assert validate(path)["status"] == "passed"
+
+
+def test_runs_from_the_test_folder(tmp_path):
+    (tmp_path / "helper_module.py").write_text("VALUE = 42\n")
+    path = write_test(tmp_path, "from helper_module import VALUE\n\ndef test_value():\n    assert VALUE == 42\n")
+    assert validate(path)["status"] == "passed"
+
+
+def test_format_feedback():
+    feedback = validationUtil.format_feedback({"status": "failed", "passed": 1, "failed": 2, "errors": 0,
+                                               "output": "assert 1 == 2"})
+    assert "'failed'" in feedback and "1 passed, 2 failed, 0 errors" in feedback
+    assert feedback.endswith("assert 1 == 2")
+
+
+def test_pool(tmp_path):
+    paths = [write_test(tmp_path, "def test_one():\n    pass\n", f"t{i}_test.py") for i in range(3)]
+
+    async def run():
+        pool = validationUtil.ValidationPool(max_workers=2)
+        return await asyncio.gather(*(pool.validate(path) for path in paths))
+
+    assert [result["status"] for result in asyncio.run(run())] == ["passed"] * 3
+
+
+@pytest.mark.parametrize("xml, expected", [
+    ('<testsuites><testsuite tests="3" failures="1" errors="0" skipped="1"/></testsuites>',
+     {"tests": 3, "failures": 1, "errors": 0, "skipped": 1}),
+    ('<testsuite tests="2" failures="0" errors="1" skipped="0"/>',
+     {"tests": 2, "failures": 0, "errors": 1, "skipped": 0}),
+    ("not xml", {"tests": 0, "failures": 0, "errors": 0, "skipped": 0}),
+])
+def test_read_junit_counts(tmp_path, xml, expected):
+    path = tmp_path / "report.xml"
+    path.write_text(xml)
+    assert validationUtil._read_junit_counts(str(path)) == expected